@@ -1,19 +1,24 @@
-from flask import Flask, render_template, request, redirect, url_for
-from extensions import db   # <-- import depuis extensions
-from flask import session, flash
-from flask_wtf.csrf import CSRFProtect
-from functools import wraps
-from flask_mail import Mail, Message
-from datetime import datetime
 import os
+import time
+
+import click
 from dotenv import load_dotenv
+from flask import Flask
 from flask_talisman import Talisman
-
-# Charger les variables d'environnement depuis .env
-load_dotenv()
-
-# Création de l'application Flask
-app = Flask(__name__)
+from sqlalchemy.engine import make_url
+
+import catalog
+import compression
+import dashboard
+import images
+import metrics
+import outbox
+import pagecache
+import rollups
+import routes
+import search
+from extensions import db, mail, csrf
+from models import Commande, Produit, VenteJournaliere
 
 csp = {
     'default-src': [
@@ -47,286 +52,161 @@ csp = {
     ],
 }
 
-Talisman(app, content_security_policy=csp, force_https=False)
-
-# Configuration du serveur de messagerie (depuis .env)
-app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
-app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 465))
-app.config['MAIL_USE_SSL'] = os.getenv('MAIL_USE_SSL', 'True').lower() == 'true'
-app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'False').lower() == 'true'
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
-app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
-
-
-mail = Mail(app)
-
-# Clé secrète pour les sessions (indispensable)
-app.secret_key = os.getenv('SECRET_KEY')
-
-app.config['WTF_CSRF_ENABLED'] = True
-app.config['WTF_CSRF_SECRET_KEY'] = app.secret_key  # optionnel, utilise la même clé
-csrf = CSRFProtect(app)
-
-# Configuration de la base de données SQLite
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///commandes.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialisation de SQLAlchemy avec l'application
-db.init_app(app)
-
-# Import du modèle APRÈS l'initialisation de db
-from models import Commande, Admin, Produit
-
-
-# Route pour la page d'accueil
-@app.route('/')
-def index():
-    produit = Produit.query.first()
-    return render_template('landing.html', produit=produit, active_page='index')
-
-# Route pour traiter la commande
 
-@app.route('/produit')
-def produit():
-    produit = Produit.query.first()
-    return render_template('produit.html', produit=produit, active_page='produit')
-
-@app.route('/commander')
-def commander_page():
-    produit = Produit.query.first()
-    return render_template('commande.html', produit=produit)
-
-@app.route('/commander', methods=['POST'])
-def commander():
-    # Récupération des données du formulaire
-    nom = request.form['nom']
-    prenom = request.form['prenom']
-    adresse = request.form['adresse']
-    telephone = request.form['telephone']
-    quantite = request.form['quantite']
-    email = request.form['email']
-
-    # Validations
-    erreurs = []
-    if not nom or not prenom:
-        erreurs.append("Le nom et le prénom sont obligatoires.")
-    if not email or '@' not in email:
-        erreurs.append("Email invalide.")
-    if not telephone or not telephone.isdigit() or len(telephone) < 10:
-        erreurs.append("Téléphone invalide (10 chiffres minimum).")
-    if not adresse or len(adresse) < 10:
-        erreurs.append("Adresse trop courte.")
-    try:
-        quantite = int(quantite)
-        if quantite < 1 or quantite > 10:
-            erreurs.append("Quantité doit être entre 1 et 10.")
-    except ValueError:
-        erreurs.append("Quantité invalide.")
-
-    if erreurs:
-        for err in erreurs:
-            flash(err, 'danger')
-        return redirect(url_for('commander_page'))
+def configuration():
+    """Configuration par défaut, lue dans l'environnement (et le fichier .env)."""
+    return {
+        # Serveur de messagerie
+        'MAIL_SERVER': os.getenv('MAIL_SERVER'),
+        'MAIL_PORT': int(os.getenv('MAIL_PORT', 465)),
+        'MAIL_USE_SSL': os.getenv('MAIL_USE_SSL', 'True').lower() == 'true',
+        'MAIL_USE_TLS': os.getenv('MAIL_USE_TLS', 'False').lower() == 'true',
+        'MAIL_USERNAME': os.getenv('MAIL_USERNAME'),
+        'MAIL_PASSWORD': os.getenv('MAIL_PASSWORD'),
+        'MAIL_DEFAULT_SENDER': os.getenv('MAIL_DEFAULT_SENDER'),
+        # Clé secrète pour les sessions (indispensable)
+        'SECRET_KEY': os.getenv('SECRET_KEY'),
+        'WTF_CSRF_ENABLED': True,
+        # Base de données SQLite
+        'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL', 'sqlite:///commandes.db'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # SQLALCHEMY_ENGINE_OPTIONS : déduites de l'URL dans create_app (voir options_moteur)
+        # Instrumentation : en-tête Server-Timing, jeton du scraper Prometheus pour /metrics
+        'SERVER_TIMING': os.getenv('SERVER_TIMING', 'True').lower() == 'true',
+        'METRICS_TOKEN': os.getenv('METRICS_TOKEN'),
+        # Cache du produit (TTL + invalidation à chaque modification). CACHE_URL=sqlite:///chemin
+        # partage le cache entre les workers, sinon il est local au processus.
+        'CACHE_URL': os.getenv('CACHE_URL', 'memory'),
+        'CATALOG_CACHE_TTL': int(os.getenv('CATALOG_CACHE_TTL', 300)),
+        # Cache des pages rendues : APP_VERSION change à chaque déploiement pour repartir d'un cache vide
+        'PAGE_CACHE_VERSION': os.getenv('APP_VERSION', ''),
+        'PAGE_CACHE_MAX_AGE': int(os.getenv('PAGE_CACHE_MAX_AGE', 300)),
+        # Tableau de bord admin : durée de vie du total mis en cache
+        'DASHBOARD_COUNT_TTL': int(os.getenv('DASHBOARD_COUNT_TTL', 60)),
+        # Compression gzip/brotli des réponses texte à partir de cette taille (octets)
+        'COMPRESS_MIN_SIZE': int(os.getenv('COMPRESS_MIN_SIZE', 500)),
+    }
 
-    produit = Produit.query.first()
-    if produit.stock < quantite:
-        flash("Désolé, stock insuffisant.", 'danger')
-        return redirect(url_for('commander_page'))
 
-    # Sinon, on crée la commande et on décrémente
-    produit.stock -= quantite
-    # Sinon, on crée la commande
-    # Création d'un objet Commande
-    nouvelle_commande = Commande(
-        nom=nom,
-        prenom=prenom,
-        email=email,
-        adresse=adresse,
-        telephone=telephone,
-        quantite=quantite,
-        statut='en attente'
-    )
+def options_moteur(uri):
+    """Options du moteur SQLAlchemy adaptées à l'URL de la base.
 
-    # Ajout à la base de données
-    db.session.add(nouvelle_commande)
-    db.session.flush()  # permet d'obtenir l'ID sans commit
+    Plusieurs écrivains concurrents : un pool à la taille du nombre de threads du worker,
+    et pour SQLite une attente (busy timeout, en secondes) plutôt qu'un "database is locked"
+    immédiat. Le mode WAL est activé à chaque connexion (voir extensions.py). Une base
+    SQLite en mémoire utilise un StaticPool (une seule connexion) : pas d'options de pool.
+    """
+    url = make_url(uri)
+    pool = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 5)),
+    }
+    if url.get_backend_name() != 'sqlite':
+        return pool
+    if url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory':
+        return {}
+    return {**pool, 'connect_args': {'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 30))}}
 
-    # Génération du numéro : CMD-année-000ID
-    nouvelle_commande.numero = f"CMD-{datetime.now().year}-{nouvelle_commande.id:04d}"
-    db.session.commit()
-    send_confirmation_email(nouvelle_commande)
-    send_notification_admin(nouvelle_commande)
 
-    flash('Commande enregistrée avec succès !', 'success')
-    # Redirection vers la page de confirmation
-    return redirect(url_for('confirmation', commande_id=nouvelle_commande.id))
+def create_app(config=None):
+    """Crée l'application. `config` (dict) complète ou remplace la configuration de l'environnement.
 
+    Aucun effet de bord hors de l'application : ni création de tables, ni connexion à la
+    base, ni thread. Le schéma se crée une fois avec `flask init-db`, les workers de
+    l'outbox démarrent à la première requête.
+    """
+    load_dotenv()
+    app = Flask(__name__)
+    app.config.from_mapping(configuration())
+    app.config.from_mapping(config or {})
+    # Calculées après `config` : elles suivent une URL remplacée, et `config` peut aussi les remplacer entières
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', options_moteur(app.config['SQLALCHEMY_DATABASE_URI']))
+    app.config.setdefault('WTF_CSRF_SECRET_KEY', app.config['SECRET_KEY'])  # optionnel, même clé
 
-def send_confirmation_email(commande):
-    try:
-        # Générer les versions HTML et texte à partir des templates
-        html_body = render_template('emails/confirmation_email.html', commande=commande)
-        text_body = render_template('emails/confirmation_email.txt', commande=commande)
+    Talisman(app, content_security_policy=csp, force_https=False)
+    mail.init_app(app)
+    csrf.init_app(app)
+    db.init_app(app)
 
-        msg = Message(
-            subject=f"Confirmation de commande n°{commande.id} - Dulcibelle",
-            recipients=[commande.email],
-            html=html_body,
-            body=text_body
-        )
-        mail.send(msg)
-        app.logger.info(f"Email de confirmation envoyé à {commande.email}")
-    except Exception as e:
-        app.logger.error(f"Erreur envoi email confirmation : {e}")
+    # Instrumentation : latence par endpoint, SQL, templates, SMTP (en-tête Server-Timing,
+    # /metrics au format Prometheus). Initialisée avant les autres hooks pour les mesurer.
+    metrics.init_app(app)
 
-def send_notification_admin(commande):
-    try:
-        admin_email = os.getenv('ADMIN_EMAIL')
-        if not admin_email:
-            app.logger.error("ADMIN_EMAIL non défini dans les variables d'environnement")
-            return
-        msg = Message(
-            subject=f"Nouvelle commande n°{commande.id} - Dulcibelle",
-            recipients=[admin_email]
-        )
-        msg.body = f"""
-        Nouvelle commande reçue :\n
-        Client : {commande.prenom} {commande.nom}\n
-        Téléphone : {commande.telephone}\n
-        Adresse : {commande.adresse}\n
-        Quantité : {commande.quantite}\n
-        """
-        mail.send(msg)
-    except Exception as e:
-        app.logger.error(f"Erreur envoi email admin : {e}")
+    # File d'attente des emails, vidée par un pool de workers en arrière-plan
+    outbox.init_app(app, mail)
 
-# Route de confirmation
-@app.route('/confirmation/<int:commande_id>')
-def confirmation(commande_id):
-    commande = Commande.query.get_or_404(commande_id)
-    return render_template('confirmation.html', commande=commande)
+    # Cache du produit, invalidé à chaque modification (voir catalog.py)
+    catalog.init_app(app)
 
-@app.route('/histoire')
-def histoire():
-    return render_template('histoire.html', active_page='histoire')
+    # Cache des pages rendues (décorateur @cached_page, route par route), avec ETag et 304.
+    pagecache.init_app(app)
 
-@app.route('/contact')
-def contact():
-    return render_template('contact.html', active_page='contact')
+    # Images responsives : variantes générées par `flask images-build` (static/build/images),
+    # helpers de templates responsive_image / image_srcset / image_url
+    images.init_app(app)
 
-# Routes pour les pages légales
-@app.route('/mentions-legales')
-def mentions():
-    return render_template('mentions.html')
+    # Tableau de bord admin : pagination par curseur, total mis en cache
+    dashboard.init_app(app)
 
-@app.route('/cgv')
-def cgv():
-    return render_template('cgv.html', active_page='cgv')
+    # Recherche plein texte (FTS5) dans les commandes, `flask search-rebuild` pour (re)construire l'index
+    search.init_app(app)
 
-@app.route('/faq')
-def faq():
-    return render_template('faq.html', active_page='faq')
+    # Statistiques de ventes : agrégats par jour, `flask rollups-rebuild` pour les recalculer
+    rollups.init_app(app)
 
+    # Compression des réponses (gzip, brotli si installé) et fichiers statiques précompressés
+    # par `flask compress-static`
+    compression.init_app(app)
 
-# Décorateur pour protéger les routes admin
-def login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not session.get('admin_logged_in'):
-            flash('Veuillez vous connecter pour accéder à cette page.', 'danger')
-            return redirect(url_for('admin_login'))
-        return f(*args, **kwargs)
-    return decorated_function
+    routes.init_app(app)
 
-@app.route('/admin/login', methods=['GET', 'POST'])
-def admin_login():
-    if request.method == 'POST':
-        username = request.form['username']
-        password = request.form['password']
-        admin = Admin.query.filter_by(username=username).first()
-        if admin and admin.check_password(password):
-            session['admin_logged_in'] = True
-            flash('Connexion réussie.', 'success')
-            return redirect(url_for('admin_dashboard'))
-        else:
-            flash('Identifiants incorrects.', 'danger')
-    return render_template('admin_login.html')
+    @app.cli.command('init-db')
+    @click.option('--stock', default=100, show_default=True, help='stock du produit par défaut')
+    def init_db_command(stock):
+        """Crée le schéma (tables, index, recherche, agrégats) et le produit par défaut. Idempotent."""
+        debut = time.perf_counter()
+        initialiser_base(stock)
+        click.echo(f"Base initialisée en {time.perf_counter() - debut:.1f}s.")
 
-@app.route('/admin/logout')
-def admin_logout():
-    session.pop('admin_logged_in', None)
-    flash('Vous êtes déconnecté.', 'info')
-    return redirect(url_for('admin_login'))
+    return app
 
-@app.route('/admin/dashboard')
-@login_required
-def admin_dashboard():
-    # Pagination simple (10 commandes par page)
-    page = request.args.get('page', 1, type=int)
-    commandes = Commande.query.order_by(Commande.date_commande.desc()).paginate(page=page, per_page=10)
-    return render_template('admin_dashboard.html', commandes=commandes)
 
-@app.route('/admin/commande/<int:id>')
-@login_required
-def admin_commande_detail(id):
-    commande = Commande.query.get_or_404(id)
-    return render_template('admin_commande_detail.html', commande=commande)
+def apres_fork(app):
+    """À appeler dans un processus forké (hook post_fork de gunicorn, voir gunicorn.conf.py).
 
-@app.route('/admin/commande/<int:id>/statut', methods=['POST'])
-@login_required
-def admin_changer_statut(id):
-    commande = Commande.query.get_or_404(id)
-    nouveau_statut = request.form['statut']
-    if nouveau_statut in ['en attente', 'expédiée', 'annulée']:
-        commande.statut = nouveau_statut
+    L'enfant ne doit pas réutiliser les connexions SQLite ouvertes par le parent : on vide
+    le pool, sans fermer les connexions qui restent celles du parent.
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def initialiser_base(stock=100):
+    """Étape unique de déploiement, à lancer avant les workers (`flask init-db`)."""
+    db.create_all()
+    # Colonne ajoutée après coup : create_all ne modifie pas une table existante. Les anciennes
+    # commandes reçoivent le prix actuel, le seul connu.
+    if 'prix_unitaire' not in {c['name'] for c in db.inspect(db.engine).get_columns('commande')}:
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('ALTER TABLE commande ADD COLUMN prix_unitaire FLOAT')
+            connection.exec_driver_sql('UPDATE commande SET prix_unitaire = (SELECT min(prix) FROM produit)')
+    # create_all ne crée pas les index d'une table déjà existante
+    for index in Commande.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    # Index de recherche : créé puis rempli s'il manque sur une base existante
+    with db.engine.begin() as connection:
+        index_cree = search.creer_index(connection)
+    if index_cree:
+        search.reconstruire_index()
+    # Agrégats de ventes : premier remplissage sur une base existante
+    if VenteJournaliere.query.first() is None:
+        rollups.recalculer_agregats()
+    # Créer le produit par défaut s'il n'existe pas
+    if Produit.query.count() == 0:
+        db.session.add(Produit(stock=stock))
         db.session.commit()
-        flash('Statut mis à jour.', 'success')
-    else:
-        flash('Statut invalide.', 'danger')
-    return redirect(url_for('admin_commande_detail', id=id))
 
-@app.errorhandler(404)
-def page_not_found(e):
-    return render_template('404.html'), 404
 
-@app.errorhandler(500)
-def internal_server_error(e):
-    return render_template('500.html'), 500
-
-@app.route('/debug-templates')
-def debug_templates():
-    template_dir = os.path.join(app.root_path, 'templates')
-    if os.path.exists(template_dir):
-        files = os.listdir(template_dir)
-        return f"Fichiers dans templates : {files}"
-    else:
-        return "Le dossier templates n'existe pas !"
-
-@app.route('/debug-mail-config')
-def debug_mail_config():
-    config = {
-        'MAIL_SERVER': app.config.get('MAIL_SERVER'),
-        'MAIL_PORT': app.config.get('MAIL_PORT'),
-        'MAIL_USE_SSL': app.config.get('MAIL_USE_SSL'),
-        'MAIL_USE_TLS': app.config.get('MAIL_USE_TLS'),
-        'MAIL_USERNAME': app.config.get('MAIL_USERNAME'),
-        'MAIL_DEFAULT_SENDER': app.config.get('MAIL_DEFAULT_SENDER'),
-    }
-    return str(config)
-
-@app.errorhandler(400)
-def csrf_error(error):
-    flash('Le formulaire a expiré ou est invalide. Veuillez réessayer.', 'danger')
-    return redirect(request.referrer or url_for('index'))
-
-# Lancement de l'application
+# Serveur de développement. En production : `flask init-db` une fois, puis gunicorn wsgi:app
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        # Créer le produit par défaut s'il n'existe pas
-        if Produit.query.count() == 0:
-            p = Produit(stock=100)
-            db.session.add(p)
-            db.session.commit()
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    create_app().run(host="0.0.0.0", port=5000, debug=os.getenv('FLASK_DEBUG', 'True').lower() == 'true')
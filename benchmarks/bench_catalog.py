@@ -0,0 +1,75 @@
+"""Non-régression : cache du produit partagé entre workers et son invalidation.
+
+Deux applications (deux workers) partagent la même base et le même cache SQLite
+(CACHE_URL=sqlite:///...). Vérifie, sur les compteurs hits/misses de chaque worker :
+
+    lecture        le 1er accès est un miss, les suivants des hits, y compris chez l'autre worker
+    ORM            une modification du produit suivie d'un commit invalide le cache des deux workers
+    en masse       Produit.reserver_stock (UPDATE en masse) invalide aussi le cache au commit
+    rollback       une modification annulée n'invalide rien
+
+Usage : python benchmarks/bench_catalog.py
+"""
+from bench_dashboard import base_jetable, creer_app
+
+
+def main():
+    with base_jetable() as (dossier, _):
+        from app import initialiser_base
+        from extensions import db
+        from models import Produit
+        import catalog
+
+        cache_url = f"sqlite:///{dossier}/cache.db"
+        a = creer_app(CACHE_URL=cache_url)
+        b = creer_app(CACHE_URL=cache_url)
+        with a.app_context():
+            initialiser_base(stock=100)
+
+        def lire(app):
+            with app.app_context():
+                return catalog.get_produit()
+
+        def verifier(app, hits, misses, etape):
+            stats = app.extensions['catalog'].stats()
+            attendu = {'hits': hits, 'misses': misses}
+            obtenu = {'hits': stats['hits'], 'misses': stats['misses']}
+            assert obtenu == attendu, f"{etape} : {obtenu} au lieu de {attendu}"
+            print(f"{etape:<40} {obtenu}")
+
+        # 1. Lecture : un seul chargement depuis la base pour les deux workers
+        prix = lire(a)['prix']
+        lire(a)
+        verifier(a, 1, 1, 'A : 1re lecture puis 2e')
+        lire(b)
+        verifier(b, 1, 0, 'B : lecture après A (cache partagé)')
+
+        # 2. Modification ORM (événements de mapper + _invalider_apres_commit)
+        with b.app_context():
+            produit = db.session.get(Produit, lire(b)['id'])
+            produit.prix = prix + 10
+            db.session.commit()
+        verifier(b, 2, 0, 'B : lecture avant modification')
+        assert lire(a)['prix'] == prix + 10, "A lit encore l'ancien prix"
+        verifier(a, 1, 2, 'A : lecture après modification par B')
+
+        # 3. UPDATE en masse (_update_en_masse)
+        with a.app_context():
+            assert Produit.reserver_stock(3)
+            db.session.commit()
+        assert lire(b)['stock'] == 97, "B lit encore l'ancien stock"
+        verifier(b, 2, 1, 'B : lecture après reserver_stock par A')
+
+        # 4. Rollback : rien à invalider
+        with a.app_context():
+            assert Produit.reserver_stock(3)
+            db.session.rollback()
+            db.session.commit()
+        assert lire(b)['stock'] == 97
+        verifier(b, 3, 1, 'B : lecture après un rollback de A')
+
+        print('OK : cache partagé et invalidation entre workers')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark des commandes concurrentes sur POST /commander.
+
+Lance N threads qui passent des commandes en parallèle sur une base SQLite jetable,
+affiche le débit (commandes/s) et vérifie que le stock final est exact :
+
+    stock final == stock initial - somme des quantités commandées
+
+Usage : python benchmarks/bench_checkout.py --threads 8 --commandes 400 --stock 1000
+"""
+import argparse
+import threading
+import time
+
+from bench_dashboard import base_jetable, creer_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--commandes', type=int, default=400, help='nombre total de tentatives de commande')
+    parser.add_argument('--quantite', type=int, default=3)
+    parser.add_argument('--stock', type=int, default=1000)
+    args = parser.parse_args()
+
+    with base_jetable(DB_POOL_SIZE=str(args.threads)):
+        from extensions import db
+        from models import Commande, Produit
+
+        app = creer_app()
+        with app.app_context():
+            db.create_all()
+            db.session.add(Produit(stock=args.stock))
+            db.session.commit()
+
+        formulaire = {
+            'nom': 'Bench', 'prenom': 'Test', 'email': 'bench@example.com',
+            'telephone': '0600000000', 'adresse': '1 rue du Benchmark, Errachidia',
+            'quantite': str(args.quantite),
+        }
+        resultats = {'ok': 0, 'rupture': 0, 'erreur': 0}
+        verrou = threading.Lock()
+        par_thread = args.commandes // args.threads
+
+        def client():
+            c = app.test_client()
+            for _ in range(par_thread):
+                r = c.post('/commander', data=formulaire)
+                cle = 'erreur'
+                if r.status_code == 302:
+                    cle = 'ok' if '/confirmation/' in r.location else 'rupture'
+                with verrou:
+                    resultats[cle] += 1
+
+        threads = [threading.Thread(target=client) for _ in range(args.threads)]
+        debut = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duree = time.perf_counter() - debut
+
+        with app.app_context():
+            stock_final = db.session.scalar(db.select(Produit.stock))
+            commandes = db.session.scalar(db.select(db.func.count(Commande.id)))
+            vendus = db.session.scalar(db.select(db.func.coalesce(db.func.sum(Commande.quantite), 0)))
+            numeros = db.session.scalar(db.select(db.func.count(db.distinct(Commande.numero))))
+
+        total = sum(resultats.values())
+        print(f"{total} requêtes en {duree:.2f}s avec {args.threads} threads : {total / duree:.1f} req/s, "
+              f"{resultats['ok'] / duree:.1f} commandes/s")
+        print(f"acceptées={resultats['ok']} rupture={resultats['rupture']} erreurs={resultats['erreur']}")
+        print(f"stock initial={args.stock} vendus={vendus} stock final={stock_final}")
+
+        attendu = args.stock - vendus
+        assert commandes == resultats['ok'], f"{commandes} commandes en base pour {resultats['ok']} acceptées"
+        assert stock_final == attendu, f"stock final {stock_final} != {attendu}"
+        assert stock_final >= 0, "survente"
+        assert numeros == commandes, "numéros de commande en double"
+        assert resultats['erreur'] == 0, "erreurs pendant le benchmark"
+        print("OK : stock exact, aucune survente, numéros uniques.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Compression des réponses : octets transférés et CPU par requête, par route et par encodage.
+
+Pour chaque URL, compare la réponse en clair, gzip et brotli (si installé) :
+
+    octets    taille du corps transféré
+    CPU       temps CPU du processus par requête (rendu compris), en µs, mesuré :
+              - page rendue à chaque requête (cache de pages désactivé) : compression à chaque fois
+              - page servie depuis @cached_page : compressée une fois, puis resservie depuis la mémoire
+              - fichiers statiques : frères .gz/.br générés par `flask compress-static`
+
+Usage : python benchmarks/bench_compression.py --requetes 300
+"""
+import argparse
+import os
+import shutil
+import time
+
+from bench_dashboard import ROOT, base_jetable, creer_app
+
+URLS = ['/', '/produit', '/histoire', '/faq', '/static/style.css']
+
+
+def mesurer(client, url, encodage, n):
+    headers = {'Accept-Encoding': encodage} if encodage else {}
+    r = client.get(url, headers=headers)
+    assert r.status_code == 200, (url, r.status_code)
+    assert r.headers.get('Content-Encoding') == encodage, (url, encodage, r.headers.get('Content-Encoding'))
+    octets = len(r.get_data())
+    debut = time.process_time()
+    for _ in range(n):
+        client.get(url, headers=headers).close()
+    return octets, (time.process_time() - debut) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requetes', type=int, default=300)
+    args = parser.parse_args()
+
+    with base_jetable() as (dossier, _):
+        from app import initialiser_base
+        from extensions import db
+        import compression
+        from models import Produit
+
+        # Copie de static/ : les frères précompressés ne sont pas écrits dans le dépôt
+        static = shutil.copytree(os.path.join(ROOT, 'static'), os.path.join(dossier, 'static'),
+                                 ignore=shutil.ignore_patterns('*.gz', '*.br'))
+        app = creer_app()
+        app.static_folder = static
+        with app.app_context():
+            db.create_all()
+            db.session.add(Produit(stock=100, description='Sérum', ingredients='Propolis\nMiel', utilisation='Matin et soir'))
+            db.session.commit()
+            initialiser_base()
+        compression.compresser_statiques(static)
+
+        client = app.test_client()
+        encodages = [None] + compression.encodages_disponibles()
+        print(f"{'url':<20}{'encodage':<10}{'octets':>9}{'CPU rendu':>13}{'CPU cache':>13}")
+        for url in URLS:
+            for encodage in encodages:
+                app.config['PAGE_CACHE_ENABLED'] = False
+                octets, cpu_rendu = mesurer(client, url, encodage, args.requetes)
+                app.config['PAGE_CACHE_ENABLED'] = True
+                _, cpu_cache = mesurer(client, url, encodage, args.requetes)
+                print(f"{url:<20}{encodage or 'identity':<10}{octets:>9}{cpu_rendu:>10.0f} µs{cpu_cache:>10.0f} µs")
+        if compression.brotli is None:
+            print("\nbrotli n'est pas installé : seul gzip est mesuré (pip install brotli).")
+
+
+if __name__ == '__main__':
+    main()
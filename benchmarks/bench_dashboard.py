@@ -0,0 +1,119 @@
+"""Benchmark de la pagination du tableau de bord admin sur une base synthétique.
+
+Remplit une base SQLite jetable (1 000 000 de commandes par défaut), puis mesure la
+latence d'une page à différentes profondeurs : pagination par curseur (keyset) contre
+l'ancienne pagination OFFSET, avec et sans filtre de statut.
+
+Usage : python benchmarks/bench_dashboard.py --commandes 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STATUTS = ['en attente', 'expédiée', 'annulée']
+
+
+def remplir(chemin, n, lot=50000):
+    """Insère n commandes réparties sur 3 ans, directement en SQL (bien plus rapide que l'ORM)."""
+    conn = sqlite3.connect(chemin)
+    debut = datetime(2023, 1, 1)
+    etalement = 3 * 365 * 24 * 3600
+    random.seed(42)
+    for depart in range(0, n, lot):
+        lignes = []
+        for i in range(depart, min(depart + lot, n)):
+            date = debut + timedelta(seconds=int(etalement * i / n) + random.randint(0, 60))
+            lignes.append((f'Nom{i}', f'Prenom{i}', f'{i} rue du Test, Errachidia', f'06{i:08d}',
+                           random.randint(1, 3), date.strftime('%Y-%m-%d %H:%M:%S.%f'),
+                           random.choice(STATUTS), f'client{i}@example.com', f'CMD-{date.year}-{i + 1:04d}'))
+        conn.executemany(
+            'INSERT INTO commande (nom, prenom, adresse, telephone, quantite, date_commande, statut, email, numero) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', lignes)
+        conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+@contextmanager
+def base_jetable(**env):
+    """Base SQLite jetable pour un benchmark, dans un dossier temporaire supprimé à la sortie.
+
+    Exporte DATABASE_URL (et `env`) avant la création de l'application. Renvoie (dossier, chemin).
+    """
+    with tempfile.TemporaryDirectory(prefix='dulcibelle-bench-') as dossier:
+        chemin = os.path.join(dossier, 'bench.db')
+        os.environ.update(env, DATABASE_URL=f"sqlite:///{chemin}")
+        os.environ.setdefault('SECRET_KEY', 'bench')
+        yield dossier, chemin
+
+
+def creer_app(**config):
+    """Application des benchmarks : sans CSRF ni workers d'outbox, sauf si `config` les réactive."""
+    from app import create_app
+    return create_app({'WTF_CSRF_ENABLED': False, 'OUTBOX_AUTOSTART': False, **config})
+
+
+def chronometrer(fn, repetitions=20):
+    fn()  # échauffement
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fn()
+    return (time.perf_counter() - debut) / repetitions * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--commandes', type=int, default=1000000)
+    parser.add_argument('--per-page', type=int, default=10)
+    args = parser.parse_args()
+
+    with base_jetable() as (_, chemin):
+        from extensions import db
+        import dashboard
+        from models import Commande
+
+        app = creer_app()
+
+        with app.app_context():
+            db.create_all()
+        debut = time.perf_counter()
+        remplir(chemin, args.commandes)
+        print(f"{args.commandes} commandes générées en {time.perf_counter() - debut:.1f}s ({chemin})")
+
+        with app.app_context():
+            for statut in (None, 'expédiée'):
+                filtres = dashboard.Filtres(statut=statut)
+                print(f"\nFiltre statut={statut or 'tous'}")
+                print(f"{'page':>8}{'curseur (ms)':>15}{'OFFSET (ms)':>15}")
+                base = filtres.appliquer(db.select(Commande)).order_by(Commande.date_commande.desc(), Commande.id.desc())
+                total = dashboard.compter_commandes(filtres)
+                for page in (p for p in (1, 10, 100, 1000, 10000, 50000) if p * args.per_page <= total):
+                    offset = (page - 1) * args.per_page
+                    curseur = None
+                    if offset:
+                        precedente = db.session.scalars(base.offset(offset - 1).limit(1)).one()
+                        curseur = dashboard.encoder_curseur(precedente)
+
+                    def keyset():
+                        dashboard.paginer_commandes(filtres, apres=curseur, per_page=args.per_page)
+                        db.session.expunge_all()
+
+                    def avec_offset():
+                        db.session.scalars(base.offset(offset).limit(args.per_page)).all()
+                        db.session.scalar(filtres.appliquer(db.select(db.func.count(Commande.id))))
+                        db.session.expunge_all()
+
+                    print(f"{page:>8}{chronometrer(keyset):>15.2f}{chronometrer(avec_offset, 5):>15.2f}")
+
+
+if __name__ == '__main__':
+    main()
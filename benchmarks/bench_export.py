@@ -0,0 +1,64 @@
+"""Export en streaming des commandes : débit et mémoire sur une base synthétique.
+
+Exporte toutes les commandes (1 000 000 par défaut) via GET /admin/export et échoue si
+la mémoire résidente (RSS) du processus augmente de plus de --plafond-mo pendant l'export.
+
+Usage : python benchmarks/bench_export.py --commandes 1000000 --format csv --plafond-mo 64
+"""
+import argparse
+import os
+import time
+
+from bench_dashboard import base_jetable, creer_app, remplir
+
+
+def rss_mo():
+    # RSS courante (et non le pic) : seule l'évolution pendant l'export nous intéresse
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--commandes', type=int, default=1000000)
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    parser.add_argument('--plafond-mo', type=float, default=64)
+    args = parser.parse_args()
+
+    with base_jetable() as (_, chemin):
+        from extensions import db
+
+        app = creer_app()
+        with app.app_context():
+            db.create_all()
+        remplir(chemin, args.commandes)
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['admin_logged_in'] = True
+
+        avant = pic = rss_mo()
+        debut = time.perf_counter()
+        response = client.get(f'/admin/export?format={args.format}', buffered=False)
+        assert response.status_code == 200, response.status_code
+        octets = lignes = 0
+        for i, morceau in enumerate(response.response):
+            octets += len(morceau)
+            lignes += morceau.count(b'\n') if isinstance(morceau, bytes) else morceau.count('\n')
+            if i % 50 == 0:
+                pic = max(pic, rss_mo())
+        response.close()
+        duree = time.perf_counter() - debut
+        pic = max(pic, rss_mo())
+
+        attendu = args.commandes + (1 if args.format == 'csv' else 0)  # + ligne d'en-tête
+        print(f"{lignes} lignes, {octets / 1024 / 1024:.1f} Mo en {duree:.1f}s ({args.commandes / duree:.0f} commandes/s)")
+        print(f"RSS avant {avant:.1f} Mo, pic pendant l'export {pic:.1f} Mo (+{pic - avant:.1f} Mo)")
+        assert lignes == attendu, f"{lignes} lignes exportées, {attendu} attendues"
+        assert pic - avant < args.plafond_mo, f"la mémoire a augmenté de {pic - avant:.1f} Mo (plafond {args.plafond_mo} Mo)"
+        print(f"OK : mémoire sous le plafond de {args.plafond_mo} Mo.")
+
+
+if __name__ == '__main__':
+    main()
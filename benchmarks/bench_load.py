@@ -0,0 +1,316 @@
+"""Test de charge reproductible des routes boutique et admin, avec comparaison à une référence.
+
+Remplit une base SQLite jetable (--commandes commandes), démarre l'application sur un
+serveur WSGI local (threads) et un faux serveur SMTP, puis lance --clients clients en
+parallèle. Chaque client rejoue --iterations fois le même parcours :
+
+    GET /  ->  GET /produit  ->  GET /commander (jeton CSRF)  ->  POST /commander
+        ->  GET /confirmation/<id>  ->  GET /admin/dashboard (session admin)
+
+Affiche p50/p95/p99 par route et le débit global (requêtes par seconde, tous parcours
+confondus : les routes s'enchaînent dans chaque parcours, un débit par route n'aurait pas
+de sens). La charge est lancée --repetitions fois ; chaque chiffre retenu est la médiane
+des répétitions. Avec une référence (--reference, par défaut benchmarks/baseline_load.json),
+échoue si le p95 d'une route augmente, ou si le débit baisse, de plus de --seuil (30 % par
+défaut). --enregistrer écrit la référence avec les paramètres --commandes, --clients et
+--iterations : la comparaison est refusée si ceux du test diffèrent. Les chiffres ne sont
+comparables que sur la même machine.
+
+Usage : python benchmarks/bench_load.py --commandes 50000 --clients 8 --iterations 50 --repetitions 3
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import re
+import socketserver
+import statistics
+import sys
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from bench_dashboard import base_jetable, creer_app, remplir
+
+ROUTES = ['index', 'produit', 'commander', 'confirmation', 'admin_dashboard']
+PARAMETRES = ('commandes', 'clients', 'iterations')
+REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_load.json')
+CSRF = re.compile(r'name="csrf_token" value="([^"]+)"')
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """Serveur SMTP minimal qui accepte et jette tous les messages (compte seulement).
+
+    `delai` (secondes) simule un relais lent : il est attendu avant d'accepter chaque message.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delai=0):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.delai = delai
+        self.messages = 0
+        self.verrou = threading.Lock()
+
+    def environnement(self):
+        """Variables d'environnement MAIL_* qui dirigent l'application vers ce serveur."""
+        return {
+            'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': str(self.server_address[1]),
+            'MAIL_USE_SSL': 'False', 'MAIL_USE_TLS': 'False',
+            'MAIL_USERNAME': '', 'MAIL_PASSWORD': '',
+            'MAIL_DEFAULT_SENDER': 'boutique@example.com', 'ADMIN_EMAIL': 'admin@example.com',
+        }
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def repondre(self, ligne):
+        self.wfile.write(ligne.encode() + b'\r\n')
+
+    def handle(self):
+        self.repondre('220 stub ESMTP')
+        while True:
+            ligne = self.rfile.readline()
+            if not ligne:
+                return
+            commande = ligne[:4].upper()
+            if commande in (b'EHLO', b'HELO'):
+                self.repondre('250 stub')
+            elif commande == b'DATA':
+                self.repondre('354 fin par <CRLF>.<CRLF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                time.sleep(self.server.delai)
+                with self.server.verrou:
+                    self.server.messages += 1
+                self.repondre('250 OK')
+            elif commande == b'QUIT':
+                self.repondre('221 bye')
+                return
+            else:  # MAIL, RCPT, RSET, NOOP
+                self.repondre('250 OK')
+
+
+class Client:
+    """Client HTTP avec ses cookies (donc sa session et son jeton CSRF), une connexion par requête."""
+
+    def __init__(self, port, mesures):
+        self.port = port
+        self.mesures = mesures
+        self.cookies = SimpleCookie()
+
+    def requete(self, route, methode, chemin, formulaire=None):
+        headers = {'Connection': 'close'}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={m.value}' for k, m in self.cookies.items())
+        corps = None
+        if formulaire is not None:
+            corps = urlencode(formulaire)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        debut = time.perf_counter()
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        try:
+            conn.request(methode, chemin, body=corps, headers=headers)
+            response = conn.getresponse()
+            contenu = response.read().decode('utf-8', 'replace')
+        finally:
+            conn.close()
+        duree = time.perf_counter() - debut
+        for cookie in response.headers.get_all('Set-Cookie') or []:
+            self.cookies.load(cookie)
+        if route:
+            self.mesures[route].append((duree, response.status < 400))
+        return response, contenu
+
+    def jeton(self, chemin):
+        _, contenu = self.requete(None, 'GET', chemin)
+        return CSRF.search(contenu).group(1)
+
+
+def parcours(client, iterations, hasard):
+    client.requete(None, 'POST', '/admin/login',
+                   {'csrf_token': client.jeton('/admin/login'), 'username': 'bench', 'password': 'bench'})
+    for i in range(iterations):
+        client.requete('index', 'GET', '/')
+        client.requete('produit', 'GET', '/produit')
+        response, _ = client.requete('commander', 'POST', '/commander', {
+            'csrf_token': client.jeton('/commander'), 'nom': 'Charge', 'prenom': f'Client{i}',
+            'email': 'charge@example.com', 'telephone': '0600000000',
+            'adresse': '1 rue du Test de charge, Errachidia', 'quantite': str(hasard.randint(1, 3)),
+        })
+        location = response.getheader('Location') or ''
+        if '/confirmation/' in location:
+            client.requete('confirmation', 'GET', location[location.index('/confirmation/'):])
+        statut = hasard.choice(['', 'en attente', 'expédiée'])
+        client.requete('admin_dashboard', 'GET', '/admin/dashboard' + (f'?{urlencode({"statut": statut})}' if statut else ''))
+
+
+def percentile(durees, p):
+    if len(durees) < 2:
+        return durees[0] if durees else 0.0
+    return statistics.quantiles(durees, n=100, method='inclusive')[p - 1]
+
+
+def resumer(mesures, duree):
+    routes = {}
+    for route in ROUTES:
+        points = mesures[route]
+        durees = sorted(d * 1000 for d, _ in points)
+        routes[route] = {
+            'requetes': len(points),
+            'erreurs': sum(1 for _, ok in points if not ok),
+            'p50': round(percentile(durees, 50), 2),
+            'p95': round(percentile(durees, 95), 2),
+            'p99': round(percentile(durees, 99), 2),
+        }
+    return {'routes': routes, 'debit': round(sum(len(p) for p in mesures.values()) / duree, 1)}
+
+
+def mediane(executions):
+    """Résultat médian de plusieurs exécutions, chiffre par chiffre (les requêtes et erreurs sont sommées)."""
+    routes = {}
+    for route in ROUTES:
+        series = [e['routes'][route] for e in executions]
+        routes[route] = {cle: sum(s[cle] for s in series) if cle in ('requetes', 'erreurs')
+                         else round(statistics.median(s[cle] for s in series), 2)
+                         for cle in series[0]}
+    return {'routes': routes, 'debit': round(statistics.median(e['debit'] for e in executions), 1)}
+
+
+def comparer(resultats, reference, seuil):
+    """Liste des régressions (p95 plus lent ou débit plus faible que la référence, au-delà du seuil)."""
+    regressions = []
+    for route, actuel in resultats['routes'].items():
+        base = reference['routes'].get(route)
+        if base and actuel['p95'] > base['p95'] * (1 + seuil):
+            regressions.append(f"{route} : p95 {actuel['p95']:.1f} ms contre {base['p95']:.1f} ms en référence")
+    if resultats['debit'] < reference['debit'] * (1 - seuil):
+        regressions.append(f"débit {resultats['debit']:.1f} req/s contre {reference['debit']:.1f} req/s en référence")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--commandes', type=int, default=50000, help='commandes déjà en base avant le test')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=50, help='parcours complets par client')
+    parser.add_argument('--repetitions', type=int, default=3, help='exécutions de la charge, on garde la médiane')
+    parser.add_argument('--graine', type=int, default=42)
+    parser.add_argument('--reference', default=REFERENCE)
+    parser.add_argument('--seuil', type=float, default=0.30, help='régression tolérée (0.30 = 30 %%)')
+    parser.add_argument('--enregistrer', action='store_true', help='écrit les résultats comme nouvelle référence')
+    args = parser.parse_args()
+
+    smtp = SMTPStub()
+    threading.Thread(target=smtp.serve_forever, daemon=True).start()
+
+    # Pool : clients + workers de l'outbox
+    with base_jetable(DB_POOL_SIZE=str(args.clients + 4), **smtp.environnement()) as (_, chemin):
+        from werkzeug.serving import make_server
+        from extensions import db
+        import outbox
+        import rollups
+        from models import Admin, Commande, Produit
+
+        # Comme en production : jetons CSRF vérifiés, emails envoyés en arrière-plan
+        app = creer_app(WTF_CSRF_ENABLED=True, OUTBOX_AUTOSTART=True)
+
+        with app.app_context():
+            db.create_all()
+        remplir(chemin, args.commandes)
+        with app.app_context():
+            admin = Admin(username='bench')
+            admin.set_password('bench')
+            db.session.add(admin)
+            db.session.add(Produit(stock=args.clients * args.iterations * 3 * args.repetitions, description='Sérum',
+                                   ingredients='Propolis\nMiel', utilisation='Matin et soir'))
+            db.session.commit()
+            rollups.recalculer_agregats()
+
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        serveur = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=serveur.serve_forever, daemon=True).start()
+        print(f"{args.commandes} commandes en base, {args.clients} clients x {args.iterations} parcours, "
+              f"{args.repetitions} répétition(s) sur http://127.0.0.1:{serveur.server_port}")
+
+        def executer(repetition):
+            mesures = {route: [] for route in ROUTES}
+            verrou = threading.Lock()
+
+            def lancer(n):
+                locales = {route: [] for route in ROUTES}
+                hasard = random.Random(args.graine + repetition * args.clients + n)
+                parcours(Client(serveur.server_port, locales), args.iterations, hasard)
+                with verrou:
+                    for route, points in locales.items():
+                        mesures[route].extend(points)
+
+            threads = [threading.Thread(target=lancer, args=(n,)) for n in range(args.clients)]
+            debut = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            duree = time.perf_counter() - debut
+            resultat = resumer(mesures, duree)
+            print(f"répétition {repetition + 1} : {resultat['debit']:.1f} req/s en {duree:.1f}s")
+            return resultat
+
+        executions = [executer(r) for r in range(args.repetitions)]
+
+        # Les emails partent en arrière-plan : on laisse l'outbox se vider avant de compter
+        with app.app_context():
+            attente = time.perf_counter()
+            while app.extensions['outbox'].running and time.perf_counter() - attente < 30:
+                depth = outbox.queue_depth()
+                if not depth.get('en attente') and not depth.get('en cours'):
+                    break
+                time.sleep(0.2)
+            commandes = db.session.scalar(db.select(db.func.count(Commande.id))) - args.commandes
+        serveur.shutdown()
+        app.extensions['outbox'].stop()
+        smtp.shutdown()
+
+        resultats = mediane(executions)
+        resultats['parametres'] = {cle: getattr(args, cle) for cle in PARAMETRES}
+        resultats['repetitions'] = args.repetitions
+        total = sum(r['requetes'] for r in resultats['routes'].values())
+        print(f"\nmédiane sur {args.repetitions} répétition(s)")
+        print(f"{'route':<18}{'requêtes':>10}{'erreurs':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for route, r in resultats['routes'].items():
+            print(f"{route:<18}{r['requetes']:>10}{r['erreurs']:>9}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['p99']:>9.1f}")
+        print(f"\n{total} requêtes mesurées, débit médian {resultats['debit']:.1f} req/s, "
+              f"{commandes} commandes passées, {smtp.messages} emails reçus par le SMTP local")
+
+        erreurs = sum(r['erreurs'] for r in resultats['routes'].values())
+        assert not erreurs, f"{erreurs} requête(s) en erreur"
+
+        if args.enregistrer:
+            with open(args.reference, 'w') as f:
+                json.dump(resultats, f, indent=2, sort_keys=True)
+                f.write('\n')
+            print(f"Référence enregistrée dans {args.reference}")
+            return
+        if not os.path.exists(args.reference):
+            print(f"Pas de référence ({args.reference}) : relancer avec --enregistrer pour en créer une.")
+            return
+        with open(args.reference) as f:
+            reference = json.load(f)
+        if reference.get('parametres') != resultats['parametres']:
+            print(f"Paramètres différents de la référence ({reference.get('parametres')} contre "
+                  f"{resultats['parametres']}) : comparaison impossible, relancer avec les mêmes "
+                  f"paramètres ou enregistrer une nouvelle référence.")
+            sys.exit(2)
+        regressions = comparer(resultats, reference, args.seuil)
+        for regression in regressions:
+            print(f"RÉGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"OK : aucune régression de plus de {args.seuil:.0%} par rapport à la référence.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Non-régression : un relais SMTP lent ne doit jamais bloquer les commandes.
+
+Met --emails commandes en file (2 emails chacune), puis envoie ce lot vers un SMTP local
+qui met --delai secondes par message, avec un busy timeout SQLite plus court que le
+temps d'envoi d'un lot. Pendant ce vidage, des commandes sont passées en continu : toutes
+doivent aboutir (302 vers /confirmation), aucune ne doit recevoir "database is locked".
+
+Puis un lot plus long que OUTBOX_LOCK_TIMEOUT est envoyé pendant qu'un second worker
+cherche du travail : il ne doit pas reprendre ce lot, aucun email ne part en double.
+
+Usage : python benchmarks/bench_outbox.py --delai 1.5 --busy-timeout 2
+"""
+import argparse
+import threading
+import time
+
+from bench_dashboard import base_jetable, creer_app
+from bench_load import SMTPStub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--emails', type=int, default=3, help='commandes en file avant le vidage')
+    parser.add_argument('--delai', type=float, default=1.5, help='secondes par message côté SMTP')
+    parser.add_argument('--busy-timeout', type=int, default=2)
+    args = parser.parse_args()
+
+    smtp = SMTPStub(delai=args.delai)
+    threading.Thread(target=smtp.serve_forever, daemon=True).start()
+
+    with base_jetable(SQLITE_BUSY_TIMEOUT=str(args.busy_timeout), **smtp.environnement()):
+        from sqlalchemy import update
+
+        from app import initialiser_base
+        from extensions import db
+        from models import EmailOutbox
+        import outbox
+
+        app = creer_app(OUTBOX_BATCH_SIZE=2 * args.emails)
+        with app.app_context():
+            initialiser_base(stock=1000)
+
+        formulaire = {
+            'nom': 'Outbox', 'prenom': 'Test', 'email': 'outbox@example.com',
+            'telephone': '0600000000', 'adresse': '1 rue du Relais lent, Errachidia', 'quantite': '1',
+        }
+        client = app.test_client()
+        pool = app.extensions['outbox']
+
+        def commander(n):
+            for _ in range(n):
+                assert '/confirmation/' in client.post('/commander', data=formulaire).location
+
+        def vider():
+            with app.app_context():
+                pool.process_batch()  # un seul lot : celui réservé maintenant
+
+        # 1. Les commandes passent pendant l'envoi d'un lot
+        commander(args.emails)
+        videur = threading.Thread(target=vider)
+        debut = time.perf_counter()
+        videur.start()
+        time.sleep(args.delai / 2)  # le premier message est en cours d'envoi
+
+        resultats = {'ok': 0, 'echec': 0}
+        while videur.is_alive():
+            r = client.post('/commander', data=formulaire)
+            resultats['ok' if r.status_code == 302 and '/confirmation/' in r.location else 'echec'] += 1
+            time.sleep(0.2)
+        videur.join()
+        duree = time.perf_counter() - debut
+        envoyes = smtp.messages
+
+        print(f"{envoyes} emails envoyés en {duree:.1f}s ({args.delai}s par message, busy timeout {args.busy_timeout}s)")
+        print(f"commandes pendant le vidage : {resultats['ok']} acceptées, {resultats['echec']} en échec")
+        assert envoyes == 2 * args.emails, f"{envoyes} emails reçus, {2 * args.emails} attendus"
+        assert resultats['ok'] and not resultats['echec'], "des commandes ont échoué pendant l'envoi des emails"
+        print("OK : l'envoi SMTP ne bloque pas les commandes.")
+
+        # 2. Un lot plus long que le verrou (3 messages) : il doit être prolongé avant qu'un autre
+        # worker ne le reprenne. La file est d'abord vidée sans SMTP pour que le second worker
+        # ne trouve que ce lot.
+        with app.app_context():
+            db.session.execute(update(EmailOutbox).where(EmailOutbox.statut == 'en attente').values(statut='échec'))
+            db.session.commit()
+        app.config['OUTBOX_LOCK_TIMEOUT'] = 3 * args.delai
+        pool.configure()
+        commander(args.emails)
+        lot = threading.Thread(target=vider)
+        lot.start()
+        repris = 0
+        with app.app_context():
+            while lot.is_alive():
+                time.sleep(args.delai / 2)
+                repris += pool.process_batch()  # second worker
+            lot.join()
+            depth = outbox.queue_depth()
+        smtp.shutdown()
+
+        print(f"lot de {2 * args.emails} emails en {2 * args.emails * args.delai:.1f}s, verrou de "
+              f"{3 * args.delai:.1f}s : {repris} repris par le second worker, {smtp.messages - envoyes} reçus")
+        assert not repris and smtp.messages - envoyes == 2 * args.emails, "des emails sont partis en double"
+        assert smtp.messages == depth.get('envoyé'), f"{smtp.messages} emails reçus pour {depth.get('envoyé')} envoyés"
+        print("OK : un lot plus long que le verrou n'est pas envoyé deux fois.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Benchmark du cache de pages : requêtes/s par route, sans puis avec @cached_page.
+
+Compare aussi une revalidation conditionnelle (If-None-Match -> 304).
+
+Usage : python benchmarks/bench_pages.py --requetes 500
+"""
+import argparse
+import time
+
+from bench_dashboard import base_jetable, creer_app
+
+ROUTES = ['/', '/produit', '/histoire', '/contact', '/mentions-legales', '/cgv', '/faq']
+
+
+def mesurer(client, url, n, headers=None):
+    debut = time.perf_counter()
+    for _ in range(n):
+        r = client.get(url, headers=headers)
+        assert r.status_code in (200, 304), (url, r.status_code)
+    return n / (time.perf_counter() - debut)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requetes', type=int, default=500, help='requêtes par route et par mode')
+    args = parser.parse_args()
+
+    with base_jetable():
+        from extensions import db
+        from models import Produit
+
+        app = creer_app()
+        with app.app_context():
+            db.create_all()
+            db.session.add(Produit(stock=100, description='Sérum', ingredients='Propolis\nMiel', utilisation='Matin et soir'))
+            db.session.commit()
+
+        client = app.test_client()
+        print(f"{'route':<20}{'sans cache':>12}{'avec cache':>12}{'304':>12}{'gain':>8}")
+        for url in ROUTES:
+            app.config['PAGE_CACHE_ENABLED'] = False
+            sans = mesurer(client, url, args.requetes)
+            app.config['PAGE_CACHE_ENABLED'] = True
+            etag = client.get(url).headers['ETag']
+            avec = mesurer(client, url, args.requetes)
+            revalidation = mesurer(client, url, args.requetes, headers={'If-None-Match': etag})
+            print(f"{url:<20}{sans:>10.0f}/s{avec:>10.0f}/s{revalidation:>10.0f}/s{avec / sans:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark de la recherche plein texte (FTS5) des commandes sur une base synthétique.
+
+Usage : python benchmarks/bench_search.py --commandes 1000000
+"""
+import argparse
+import time
+
+from bench_dashboard import base_jetable, chronometrer, creer_app, remplir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--commandes', type=int, default=1000000)
+    args = parser.parse_args()
+
+    with base_jetable() as (_, chemin):
+        from extensions import db
+        import search
+
+        app = creer_app()
+
+        with app.app_context():
+            db.create_all()
+        debut = time.perf_counter()
+        remplir(chemin, args.commandes)  # les triggers remplissent l'index au fil des INSERT
+        print(f"{args.commandes} commandes générées et indexées en {time.perf_counter() - debut:.1f}s")
+
+        n = args.commandes
+        recherches = [
+            f'Nom{n // 2}',                       # nom exact
+            f'client{n // 3}@example.com',        # email complet
+            f'06{n // 4:08d}'[:8],                # début de téléphone
+            f'CMD-2023-{n // 10 + 1:04d}',        # numéro de commande
+            f'Prenom{n // 7}'[:9],                # préfixe de prénom (plusieurs résultats)
+            f'Nom{n // 2} Prenom{n // 2}',        # plusieurs mots
+            'example',                            # recherche très large
+        ]
+        with app.app_context():
+            for recherche in recherches:
+                resultats = search.rechercher_commandes(recherche)
+
+                def rechercher():
+                    search.rechercher_commandes(recherche)
+                    db.session.expunge_all()
+                print(f"{recherche!r:<32} {len(resultats):>3} résultat(s) {chronometrer(rechercher):>8.2f} ms")
+
+            debut = time.perf_counter()
+            search.reconstruire_index()
+            print(f"Reconstruction complète de l'index : {time.perf_counter() - debut:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Démarrage à froid : temps entre le lancement d'un processus et sa première réponse.
+
+Chaque mesure se fait dans un processus Python neuf (rien en cache en mémoire), sur une
+base initialisée une fois au préalable comme en production (`flask init-db`). Détaille :
+
+    import     import du module app (Flask, extensions, modèles, routes)
+    factory    create_app()
+    templates  compilation de tous les templates (ce que fait wsgi.py dans le maître gunicorn)
+    1re req.   première requête GET / (templates, connexion SQLite, caches vides)
+    2e req.    requête suivante, pour comparaison
+
+Deux scénarios : worker sans préchargement (tout se fait à la première requête), et worker
+forké après wsgi.py (imports et templates déjà faits dans le maître, seule la 1re requête compte).
+
+Usage : python benchmarks/bench_startup.py --repetitions 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from bench_dashboard import ROOT, base_jetable
+
+ENFANT = r'''
+import json, sys, time
+debut = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+mesures = {}
+from app import create_app, initialiser_base
+mesures['import'] = time.perf_counter() - debut
+t = time.perf_counter()
+app = create_app({'OUTBOX_AUTOSTART': False})
+mesures['factory'] = time.perf_counter() - t
+if sys.argv[2] == 'init':
+    with app.app_context():
+        initialiser_base()
+    sys.exit(0)
+if sys.argv[2] == 'wsgi':
+    t = time.perf_counter()
+    for nom in app.jinja_env.list_templates():
+        app.jinja_env.get_template(nom)
+    mesures['templates'] = time.perf_counter() - t
+client = app.test_client()
+for cle in ('1re req.', '2e req.'):
+    t = time.perf_counter()
+    assert client.get('/').status_code == 200
+    mesures[cle] = time.perf_counter() - t
+print(json.dumps(mesures))
+'''
+
+
+def lancer(mode, env):
+    debut = time.perf_counter()
+    sortie = subprocess.run([sys.executable, '-c', ENFANT, ROOT, mode], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    total = time.perf_counter() - debut
+    return total, json.loads(sortie) if sortie.strip() else {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repetitions', type=int, default=10)
+    args = parser.parse_args()
+
+    with base_jetable():
+        env = dict(os.environ)
+        lancer('init', env)
+
+        for mode, titre in (('froid', 'sans préchargement'), ('wsgi', 'avec wsgi.py (préchargement)')):
+            totaux, etapes = [], {}
+            for _ in range(args.repetitions):
+                total, mesures = lancer(mode, env)
+                totaux.append(total)
+                for cle, valeur in mesures.items():
+                    etapes.setdefault(cle, []).append(valeur)
+            print(f"\n{titre} : médiane sur {args.repetitions} processus")
+            for cle, valeurs in etapes.items():
+                print(f"  {cle:<12}{statistics.median(valeurs) * 1000:>9.1f} ms")
+            print(f"  {'processus':<12}{statistics.median(totaux) * 1000:>9.1f} ms (lancement de Python -> sortie)")
+            if mode == 'wsgi':
+                # Dans un worker forké, import, factory et templates ont été payés par le maître
+                print(f"  => worker forké prêt à répondre après {statistics.median(etapes['1re req.']) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
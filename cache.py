@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Valeur renvoyée par les backends quand la clé est absente ou expirée
+# (None est une valeur cachable : "aucun produit en base").
+MISS = object()
+
+
+class MemoryBackend:
+    """Cache local au processus (un dictionnaire protégé par un verrou).
+
+    Borné à `max_entries` clés : au-delà, la moins récemment utilisée est évincée (LRU).
+    """
+
+    def __init__(self, max_entries=1024):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISS
+            value, expire = entry
+            if expire < time.monotonic():
+                del self._data[key]
+                return MISS
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteBackend:
+    """Cache partagé entre processus (workers gunicorn) : une table clé/valeur dans un fichier SQLite.
+
+    Les valeurs sont sérialisées en JSON ; une invalidation faite par un worker est donc
+    vue immédiatement par tous les autres.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        # Connexion jetable : celle-ci est ouverte avant un éventuel fork, elle ne doit pas être réutilisée
+        conn = sqlite3.connect(self.path, timeout=10)
+        with conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expire REAL)')
+        conn.close()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value FROM cache WHERE key = ? AND expire >= ?', (key, time.time())
+        ).fetchone()
+        if row is None:
+            return MISS
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expire) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time() + ttl)
+            )
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache')
+
+
+def backend_from_url(url, max_entries=1024):
+    """'memory' (défaut, borné à max_entries clés) ou 'sqlite:///chemin/vers/cache.db'."""
+    if not url or url == 'memory':
+        return MemoryBackend(max_entries)
+    if url.startswith('sqlite:///'):
+        path = url[len('sqlite:///'):]
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        return SQLiteBackend(path)
+    raise ValueError(f"CACHE_URL non supportée : {url}")
+
+
+class Cache:
+    """Cache read-through avec TTL, invalidation explicite et compteurs hits/misses."""
+
+    def __init__(self, backend=None, ttl=300):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Valeur en cache, ou MISS (compte un hit ou un miss)."""
+        value = self.backend.get(key)
+        with self._lock:
+            if value is MISS:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, self.ttl if ttl is None else ttl)
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is MISS:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 3) if total else None,
+        }
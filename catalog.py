@@ -0,0 +1,71 @@
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+
+from cache import Cache, backend_from_url
+from extensions import db
+from models import Produit
+
+PRODUIT_KEY = 'catalog:produit'
+
+
+def _charger_produit():
+    produit = Produit.query.order_by(Produit.id).first()
+    if produit is None:
+        return None
+    # Un dict simple : sérialisable pour le backend partagé, et les templates
+    # y accèdent comme à l'objet (produit.prix, produit.nom...).
+    return {c.key: getattr(produit, c.key) for c in inspect(Produit).column_attrs}
+
+
+def get_produit():
+    """Le produit de la boutique, lu depuis le cache (la base n'est lue qu'en cas de miss)."""
+    return current_app.extensions['catalog'].get_or_load(PRODUIT_KEY, _charger_produit)
+
+
+def invalider_produit():
+    current_app.extensions['catalog'].invalidate(PRODUIT_KEY)
+
+
+def marquer_produit_modifie(session):
+    """Demande l'invalidation du cache au prochain commit de la session."""
+    session.info['produit_modifie'] = True
+
+
+@event.listens_for(Produit, 'after_insert')
+@event.listens_for(Produit, 'after_update')
+@event.listens_for(Produit, 'after_delete')
+def _produit_modifie(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        marquer_produit_modifie(session)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _update_en_masse(orm_execute_state):
+    # Les UPDATE/DELETE en masse (ex: Produit.reserver_stock) ne passent pas par les
+    # événements de mapper ci-dessus
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) \
+            and orm_execute_state.bind_mapper is inspect(Produit):
+        marquer_produit_modifie(orm_execute_state.session)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalider_apres_commit(session):
+    # Invalidation seulement une fois la modification visible par les autres connexions
+    if session.info.pop('produit_modifie', False):
+        invalider_produit()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _oublier_apres_rollback(session):
+    session.info.pop('produit_modifie', None)
+
+
+def init_app(app):
+    cache = Cache(
+        backend_from_url(app.config.get('CACHE_URL')),
+        ttl=app.config.get('CATALOG_CACHE_TTL', 300)
+    )
+    app.extensions['catalog'] = cache
+    return cache
@@ -0,0 +1,204 @@
+import gzip
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+
+import click
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli  # optionnel : pip install brotli (ou brotlicffi, même API)
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# Types compressibles : le texte. Les images (JPEG, PNG, WebP), polices woff2 et archives
+# sont déjà compressées, les recompresser coûte du CPU pour gagner 0 à 2 %.
+TYPES_COMPRESSIBLES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript', 'text/xml',
+    'application/javascript', 'application/json', 'application/xml', 'application/x-ndjson',
+    'application/manifest+json', 'image/svg+xml', 'image/x-icon',
+}
+EXTENSIONS_STATIQUES = {'.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.html', '.xml', '.ico'}
+# Suffixe du fichier précompressé, par Content-Encoding, par ordre de préférence
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def encodages_disponibles():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compresser(donnees, encodage, niveau):
+    if encodage == 'br':
+        return brotli.compress(donnees, quality=niveau)
+    return gzip.compress(donnees, compresslevel=niveau, mtime=0)  # mtime=0 : sortie reproductible
+
+
+def negocier(encodages):
+    """Meilleur encodage accepté par le client parmi `encodages` (None : réponse non compressée)."""
+    acceptes = request.accept_encodings
+    for encodage in encodages:
+        if acceptes[encodage]:
+            return encodage
+    return None
+
+
+def _ajouter_vary(response):
+    response.vary.add('Accept-Encoding')
+
+
+class Compression:
+    """Compression gzip (et brotli si installé) des réponses dynamiques.
+
+    Les réponses avec un ETag (pages de @cached_page) sont compressées une seule fois :
+    le résultat est gardé en mémoire par (ETag, encodage), les requêtes suivantes ne
+    coûtent plus de CPU de compression.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.taille_min = app.config.get('COMPRESS_MIN_SIZE', 500)
+        self.niveaux = {'gzip': app.config.get('COMPRESS_GZIP_LEVEL', 6),
+                        'br': app.config.get('COMPRESS_BR_QUALITY', 5)}
+        self.encodages = encodages_disponibles()
+        self._memo = OrderedDict()
+        self._memo_max = app.config.get('COMPRESS_MEMO_SIZE', 256)
+        self._lock = threading.Lock()
+
+    def _compresser_memo(self, etag, donnees, encodage):
+        if etag is None:
+            return compresser(donnees, encodage, self.niveaux[encodage])
+        cle = (etag, encodage)
+        with self._lock:
+            if cle in self._memo:
+                self._memo.move_to_end(cle)
+                return self._memo[cle]
+        resultat = compresser(donnees, encodage, self.niveaux[encodage])
+        with self._lock:
+            self._memo[cle] = resultat
+            if len(self._memo) > self._memo_max:
+                self._memo.popitem(last=False)
+        return resultat
+
+    def apres_requete(self, response):
+        if not self.app.config.get('COMPRESS_ENABLED', True) or response.mimetype not in TYPES_COMPRESSIBLES:
+            return response
+        # Fichiers statiques (send_file) et exports en streaming : jamais compressés ici
+        if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+            return response
+        # La représentation dépend d'Accept-Encoding, y compris pour un 304 ou une réponse
+        # que ce client-ci reçoit en clair : les caches intermédiaires doivent le savoir
+        _ajouter_vary(response)
+        if response.status_code != 200 or (response.content_length or 0) < self.taille_min:
+            return response
+        encodage = negocier(self.encodages)
+        if encodage is None:
+            return response
+
+        etag, faible = response.get_etag()
+        response.set_data(self._compresser_memo(etag, response.get_data(), encodage))
+        response.headers['Content-Encoding'] = encodage
+        if etag and not faible:
+            # Même contenu, octets différents : l'ETag devient faible (If-None-Match compare en faible)
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def _frere_a_jour(chemin, suffixe):
+    """Le frère précompressé existe et n'est pas plus ancien que sa source."""
+    try:
+        return os.path.getmtime(chemin + suffixe) >= os.path.getmtime(chemin)
+    except OSError:
+        return False
+
+
+def servir_statique(app, filename):
+    """Remplace la vue `static` : sert le frère .br/.gz précompressé s'il existe, sans CPU.
+
+    Un frère plus ancien que sa source (fichier modifié sans relancer `flask compress-static`)
+    est ignoré : la source est servie telle quelle.
+    """
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    chemin = safe_join(app.static_folder, filename)
+    freres = [e for e in SUFFIXES if chemin and _frere_a_jour(chemin, SUFFIXES[e])]
+    if freres and app.config.get('COMPRESS_ENABLED', True):
+        encodage = negocier(freres)
+        if encodage is not None:
+            response = send_from_directory(app.static_folder, filename + SUFFIXES[encodage], mimetype=mimetype,
+                                           max_age=app.get_send_file_max_age(filename))
+            response.headers['Content-Encoding'] = encodage
+            _ajouter_vary(response)
+            return response
+    response = app.send_static_file(filename)
+    if freres:
+        _ajouter_vary(response)
+    return response
+
+
+def compresser_statiques(static_folder, niveaux=None, gain_min=0.05):
+    """Écrit les frères .gz (et .br si brotli est installé) des fichiers texte de static/.
+
+    Idempotent : un frère plus récent que sa source est conservé. Un frère n'est gardé que
+    s'il fait gagner au moins `gain_min` ; les frères orphelins sont supprimés.
+    Renvoie {chemin relatif: {'identity': octets, 'gzip': octets, 'br': octets}}.
+    """
+    niveaux = niveaux or {'gzip': 9, 'br': 11}  # hors ligne : niveau maximal
+    rapport = {}
+    for dossier, _, fichiers in os.walk(static_folder):
+        for nom in fichiers:
+            chemin = os.path.join(dossier, nom)
+            racine, extension = os.path.splitext(chemin)
+            if extension in SUFFIXES.values():
+                # Frère orphelin (source supprimée) ; les vraies archives (.tar.gz...) ne sont pas touchées
+                if os.path.splitext(racine)[1].lower() in EXTENSIONS_STATIQUES and not os.path.exists(racine):
+                    os.remove(chemin)
+                continue
+            if extension.lower() not in EXTENSIONS_STATIQUES:
+                continue
+            taille = os.path.getsize(chemin)
+            tailles = {'identity': taille}
+            donnees = None
+            for encodage in encodages_disponibles():
+                cible = chemin + SUFFIXES[encodage]
+                if not os.path.exists(cible) or os.path.getmtime(cible) < os.path.getmtime(chemin):
+                    if donnees is None:
+                        with open(chemin, 'rb') as f:
+                            donnees = f.read()
+                    compresse = compresser(donnees, encodage, niveaux[encodage])
+                    if len(compresse) > taille * (1 - gain_min):
+                        if os.path.exists(cible):
+                            os.remove(cible)
+                        continue
+                    with open(cible, 'wb') as f:
+                        f.write(compresse)
+                tailles[encodage] = os.path.getsize(cible)
+            rapport[os.path.relpath(chemin, static_folder)] = tailles
+    return rapport
+
+
+def init_app(app):
+    compression = Compression(app)
+    app.extensions['compression'] = compression
+    app.after_request(compression.apres_requete)
+
+    def static(filename):
+        return servir_statique(app, filename)
+    app.view_functions['static'] = static
+
+    @app.cli.command('compress-static')
+    def compress_static_command():
+        """Précompresse les fichiers texte de static/ (.gz, et .br si brotli est installé)."""
+        rapport = compresser_statiques(app.static_folder)
+        for nom, tailles in sorted(rapport.items()):
+            detail = ', '.join(f"{e}={t // 1024 if t >= 1024 else t}{'Ko' if t >= 1024 else 'o'}"
+                               for e, t in tailles.items())
+            click.echo(f"{nom} : {detail}")
+        if brotli is None:
+            click.echo("brotli n'est pas installé : seuls les .gz ont été générés.")
+        click.echo(f"{len(rapport)} fichier(s) traité(s).")
+
+    return compression
@@ -0,0 +1,145 @@
+import base64
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, select, tuple_
+
+from cache import Cache
+from extensions import db
+from models import Commande
+
+
+class Filtres:
+    """Filtres du tableau de bord admin (statut + intervalle de dates), lus depuis request.args."""
+
+    def __init__(self, statut=None, date_debut=None, date_fin=None):
+        self.statut = statut
+        self.date_debut = date_debut
+        self.date_fin = date_fin
+
+    @classmethod
+    def depuis_args(cls, args):
+        statut = args.get('statut') or None
+        if statut not in Commande.STATUTS:
+            statut = None
+        return cls(statut, _lire_date(args.get('du')), _lire_date(args.get('au')))
+
+    def conditions(self):
+        # Les conditions suivent l'ordre des index (statut, date_commande, id)
+        conditions = []
+        if self.statut:
+            conditions.append(Commande.statut == self.statut)
+        if self.date_debut:
+            conditions.append(Commande.date_commande >= self.date_debut)
+        if self.date_fin:
+            # Date de fin incluse : on s'arrête au début du jour suivant
+            conditions.append(Commande.date_commande < self.date_fin + timedelta(days=1))
+        return conditions
+
+    def appliquer(self, query):
+        return query.where(*self.conditions())
+
+    def args(self):
+        """Paramètres d'URL à conserver dans les liens de pagination et d'export."""
+        args = {}
+        if self.statut:
+            args['statut'] = self.statut
+        if self.date_debut:
+            args['du'] = self.date_debut.strftime('%Y-%m-%d')
+        if self.date_fin:
+            args['au'] = self.date_fin.strftime('%Y-%m-%d')
+        return args
+
+    def cle(self):
+        return repr(sorted(self.args().items()))
+
+
+def _lire_date(valeur):
+    try:
+        return datetime.strptime(valeur, '%Y-%m-%d') if valeur else None
+    except ValueError:
+        return None
+
+
+def encoder_curseur(commande):
+    brut = f"{commande.date_commande.isoformat()}|{commande.id}"
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip('=')
+
+
+def decoder_curseur(curseur):
+    try:
+        brut = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4)).decode()
+        date, id_ = brut.split('|')
+        return datetime.fromisoformat(date), int(id_)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class PageCommandes:
+    """Une page du tableau de bord, paginée par curseur sur (date_commande, id).
+
+    Pas d'OFFSET : chaque page part de la dernière ligne de la précédente et descend
+    l'index, le coût est donc le même en page 1 ou en page 10 000.
+    """
+
+    def __init__(self, items, has_prev, has_next, total):
+        self.items = items
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.total = total
+
+    @property
+    def curseur_prev(self):
+        return encoder_curseur(self.items[0]) if self.items else None
+
+    @property
+    def curseur_next(self):
+        return encoder_curseur(self.items[-1]) if self.items else None
+
+
+def paginer_commandes(filtres, apres=None, avant=None, per_page=10):
+    cle = tuple_(Commande.date_commande, Commande.id)
+    query = filtres.appliquer(select(Commande))
+
+    position = decoder_curseur(avant) if avant else None
+    if position:
+        # Page précédente : on remonte l'index puis on remet dans l'ordre d'affichage
+        query = query.where(cle > position).order_by(Commande.date_commande.asc(), Commande.id.asc())
+    else:
+        position = decoder_curseur(apres) if apres else None
+        if position:
+            query = query.where(cle < position)
+        query = query.order_by(Commande.date_commande.desc(), Commande.id.desc())
+
+    items = db.session.scalars(query.limit(per_page + 1)).all()
+    encore = len(items) > per_page
+    items = items[:per_page]
+
+    if avant and position:
+        items.reverse()
+        has_prev, has_next = encore, True
+    else:
+        has_prev, has_next = bool(position), encore
+    return PageCommandes(items, has_prev, has_next, compter_commandes(filtres))
+
+
+def compter_commandes(filtres):
+    """Nombre total de commandes pour ces filtres, mis en cache quelques secondes.
+
+    Un COUNT(*) sur des centaines de milliers de lignes à chaque page vue est ce qui coûte
+    le plus cher ; un total légèrement en retard est suffisant pour l'affichage.
+    """
+    def charger():
+        return db.session.scalar(filtres.appliquer(select(func.count(Commande.id))))
+    return current_app.extensions['dashboard_counts'].get_or_load(f"count:{filtres.cle()}", charger)
+
+
+def invalider_totaux():
+    """À appeler après un commit qui change des statuts : les totaux par filtre sont faux."""
+    current_app.extensions['dashboard_counts'].clear()
+
+
+def init_app(app):
+    cache = Cache(ttl=app.config.get('DASHBOARD_COUNT_TTL', 60))
+    app.extensions['dashboard_counts'] = cache
+    return cache
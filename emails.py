@@ -0,0 +1,42 @@
+import os
+from flask import render_template, current_app
+from flask_mail import Message
+
+
+def build_confirmation_email(commande):
+    # Générer les versions HTML et texte à partir des templates
+    html_body = render_template('emails/confirmation_email.html', commande=commande)
+    text_body = render_template('emails/confirmation_email.txt', commande=commande)
+
+    return Message(
+        subject=f"Confirmation de commande n°{commande.id} - Dulcibelle",
+        recipients=[commande.email],
+        html=html_body,
+        body=text_body
+    )
+
+
+def build_notification_admin(commande):
+    admin_email = os.getenv('ADMIN_EMAIL')
+    if not admin_email:
+        current_app.logger.error("ADMIN_EMAIL non défini dans les variables d'environnement")
+        return None
+    msg = Message(
+        subject=f"Nouvelle commande n°{commande.id} - Dulcibelle",
+        recipients=[admin_email]
+    )
+    msg.body = f"""
+        Nouvelle commande reçue :\n
+        Client : {commande.prenom} {commande.nom}\n
+        Téléphone : {commande.telephone}\n
+        Adresse : {commande.adresse}\n
+        Quantité : {commande.quantite}\n
+        """
+    return msg
+
+
+# Type d'email (colonne EmailOutbox.type) -> fonction qui construit le message
+BUILDERS = {
+    'confirmation': build_confirmation_email,
+    'admin': build_notification_admin,
+}
@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from flask import Response, stream_with_context
+from sqlalchemy import select
+
+from extensions import db
+from models import Commande
+
+COLONNES = ['id', 'numero', 'date_commande', 'statut', 'nom', 'prenom', 'email',
+            'telephone', 'adresse', 'quantite']
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+TAILLE_LOT = 1000
+# Une cellule qui commence par l'un de ces caractères est interprétée comme une formule
+# par Excel/LibreOffice : les champs saisis par les clients sont préfixés par une apostrophe.
+DEBUTS_FORMULE = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _lignes(filtres):
+    """Itère sur les commandes filtrées par lots, sans jamais tout charger en mémoire.
+
+    Seules les colonnes sont lues (pas d'objets ORM dans la session) et yield_per fait
+    avancer le curseur SQLite lot par lot.
+    """
+    query = filtres.appliquer(select(*(getattr(Commande, c) for c in COLONNES)))
+    query = query.order_by(Commande.date_commande.desc(), Commande.id.desc())
+    result = db.session.execute(query.execution_options(yield_per=TAILLE_LOT))
+    for lot in result.partitions():
+        yield lot
+
+
+def _cellule(valeur):
+    if isinstance(valeur, str) and valeur.startswith(DEBUTS_FORMULE):
+        return "'" + valeur
+    return valeur
+
+
+def _csv(filtres):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM pour qu'Excel ouvre le fichier en UTF-8 (accents des noms et adresses)
+    buffer.write('﻿')
+    writer.writerow(COLONNES)
+    for lot in _lignes(filtres):
+        writer.writerows(
+            [ligne[0], ligne[1], ligne[2].strftime('%Y-%m-%d %H:%M:%S') if ligne[2] else '',
+             *(_cellule(v) for v in ligne[3:])]
+            for ligne in lot
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson(filtres):
+    for lot in _lignes(filtres):
+        yield ''.join(
+            json.dumps(dict(zip(COLONNES, ligne)), ensure_ascii=False, default=datetime.isoformat) + '\n'
+            for ligne in lot
+        )
+
+
+def exporter_commandes(filtres, format_='csv'):
+    """Réponse HTTP en streaming (chunked) : la mémoire reste constante quel que soit le volume."""
+    generateur = _csv(filtres) if format_ == 'csv' else _ndjson(filtres)
+    nom = f"commandes-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{format_}"
+    return Response(
+        stream_with_context(generateur),
+        content_type=FORMATS[format_],
+        headers={'Content-Disposition': f'attachment; filename="{nom}"'}
+    )
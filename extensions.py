@@ -1,4 +1,23 @@
+import sqlite3
+
+from flask_mail import Mail
 from flask_sqlalchemy import SQLAlchemy
+from flask_wtf.csrf import CSRFProtect
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 # Création de l'objet db sans l'associer à une application Flask pour l'instant
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+mail = Mail()
+csrf = CSRFProtect()
+
+
+@event.listens_for(Engine, 'connect')
+def configurer_sqlite(dbapi_connection, connection_record):
+    # WAL : les lectures ne bloquent plus les écritures (et inversement) entre workers.
+    # synchronous=NORMAL suffit en WAL et évite un fsync à chaque commit.
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
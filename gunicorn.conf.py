@@ -0,0 +1,32 @@
+# Réglages gunicorn : `gunicorn wsgi:app` (après un `flask init-db` unique)
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', 8000)}")
+
+# Application chargée une fois dans le maître puis forkée : démarrage des workers quasi
+# immédiat. Le pool SQLAlchemy est vidé dans chaque worker après le fork (voir post_fork).
+preload_app = True
+
+# Quelques processus, chacun avec des threads : SQLite n'accepte qu'un écrivain à la fois,
+# inutile de multiplier les processus au-delà des coeurs disponibles. Les métriques de
+# /metrics sont propres à chaque worker, distinguées par un label pid (voir metrics.py).
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# Recyclage progressif des workers (fuites mémoire éventuelles), décalé pour ne pas tous les
+# redémarrer en même temps
+max_requests = 5000
+max_requests_jitter = 500
+
+
+def post_fork(server, worker):
+    # Avec preload_app, wsgi est déjà importé : c'est l'application héritée du maître
+    from app import apres_fork
+    from wsgi import app
+    apres_fork(app)
@@ -0,0 +1,218 @@
+import hashlib
+import io
+import json
+import os
+import re
+import time
+
+import click
+from flask import request, url_for
+from markupsafe import Markup, escape
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+BUILD_DIR = 'build/images'  # relatif au dossier static
+MANIFEST = 'manifest.json'
+# Nom d'une variante : <image>-<largeur>.<empreinte du contenu>.<ext>
+EMPREINTE = re.compile(r'\.[0-9a-f]{10}\.[a-z]+$')
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG', 'png': 'PNG'}  # format du manifeste -> format Pillow
+
+
+def _a_de_la_transparence(im):
+    if im.mode == 'P':
+        im = im.convert('RGBA')
+    if im.mode not in ('RGBA', 'LA'):
+        return False
+    return im.getchannel('A').getextrema()[0] < 255
+
+
+def _encoder(im, fmt, quality):
+    buffer = io.BytesIO()
+    if fmt == 'png':
+        im.save(buffer, 'PNG', optimize=True)
+    else:
+        im.save(buffer, FORMATS[fmt], quality=quality, optimize=True, **({'method': 6} if fmt == 'webp' else {}))
+    return buffer.getvalue()
+
+
+def build_images(static_folder, widths, quality=80):
+    """Génère les variantes redimensionnées (WebP + JPEG/PNG) de static/images et le manifeste.
+
+    Chaque fichier est nommé d'après le hash de son contenu (hero1-640.3f2a9c1b7e.webp),
+    il peut donc être servi avec un cache "immutable". Fonctionne hors ligne (Pillow seulement).
+
+    Les fichiers des builds précédents sont conservés : des pages déjà en cache (navigateurs,
+    CDN, cache de pages) peuvent encore y faire référence. Seul le manifeste change ; voir
+    prune_images pour le ménage.
+    """
+    from PIL import Image  # dépendance de build uniquement
+
+    source_dir = os.path.join(static_folder, 'images')
+    build_dir = os.path.join(static_folder, BUILD_DIR)
+    os.makedirs(build_dir, exist_ok=True)
+
+    manifest = {}
+    for nom in sorted(os.listdir(source_dir)):
+        stem, ext = os.path.splitext(nom)
+        if ext.lower() not in IMAGE_EXTENSIONS:
+            continue
+        with Image.open(os.path.join(source_dir, nom)) as original:
+            original.load()
+        transparence = _a_de_la_transparence(original)
+        fallback = 'png' if transparence else 'jpeg'
+        original = original.convert('RGBA' if transparence else 'RGB')
+
+        largeurs = sorted({w for w in widths if w < original.width} | {original.width})
+        variantes = {'webp': [], fallback: []}
+        for largeur in largeurs:
+            hauteur = round(original.height * largeur / original.width)
+            im = original if largeur == original.width else original.resize((largeur, hauteur), Image.LANCZOS)
+            for fmt in variantes:
+                data = _encoder(im, fmt, quality)
+                empreinte = hashlib.sha256(data).hexdigest()[:10]
+                fichier = f"{stem}-{largeur}.{empreinte}.{'jpg' if fmt == 'jpeg' else fmt}"
+                chemin = os.path.join(build_dir, fichier)
+                if not os.path.exists(chemin):  # même empreinte = même contenu
+                    with open(chemin, 'wb') as f:
+                        f.write(data)
+                variantes[fmt].append({'width': largeur, 'path': f"{BUILD_DIR}/{fichier}", 'bytes': len(data)})
+
+        manifest[f"images/{nom}"] = {
+            'width': original.width,
+            'height': original.height,
+            'fallback': fallback,
+            'variants': variantes,
+        }
+
+    # Écriture atomique : un worker qui relit le manifeste ne voit jamais un fichier à moitié écrit
+    temporaire = os.path.join(build_dir, MANIFEST + '.tmp')
+    with open(temporaire, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporaire, os.path.join(build_dir, MANIFEST))
+    return manifest
+
+
+def prune_images(static_folder, age_min):
+    """Supprime les variantes absentes du manifeste courant et plus vieilles que `age_min` secondes.
+
+    Renvoie la liste des fichiers supprimés.
+    """
+    build_dir = os.path.join(static_folder, BUILD_DIR)
+    courants = {os.path.basename(v['path'])
+                for entry in load_manifest(static_folder).values()
+                for variantes in entry['variants'].values() for v in variantes}
+    limite = time.time() - age_min
+    supprimes = []
+    for nom in os.listdir(build_dir) if os.path.isdir(build_dir) else []:
+        chemin = os.path.join(build_dir, nom)
+        if nom.startswith(MANIFEST) or nom in courants or os.path.getmtime(chemin) > limite:
+            continue
+        os.remove(chemin)
+        supprimes.append(nom)
+    return supprimes
+
+
+def load_manifest(static_folder):
+    chemin = os.path.join(static_folder, BUILD_DIR, MANIFEST)
+    if not os.path.exists(chemin):
+        return {}
+    with open(chemin, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class ResponsiveImages:
+    """Helpers de templates basés sur le manifeste (repli sur l'image d'origine s'il n'est pas généré)."""
+
+    def __init__(self, app):
+        self.app = app
+        self.reload()
+
+    def reload(self):
+        self.manifest = load_manifest(self.app.static_folder)
+
+    def _srcset(self, variantes):
+        return ', '.join(f"{url_for('static', filename=v['path'])} {v['width']}w" for v in variantes)
+
+    def image_url(self, filename, width=None):
+        """URL de la variante de repli la plus proche de `width` (la plus grande par défaut)."""
+        entry = self.manifest.get(filename)
+        if entry is None:
+            return url_for('static', filename=filename)
+        variantes = entry['variants'][entry['fallback']]
+        choix = variantes[-1]
+        if width is not None:
+            choix = next((v for v in variantes if v['width'] >= width), variantes[-1])
+        return url_for('static', filename=choix['path'])
+
+    def image_srcset(self, filename, sizes='100vw', width=None):
+        """Attributs src/srcset/sizes à placer dans une balise <img> existante (format de repli)."""
+        entry = self.manifest.get(filename)
+        if entry is None:
+            return Markup(f'src="{escape(url_for("static", filename=filename))}"')
+        return Markup('src="{}" srcset="{}" sizes="{}" width="{}" height="{}"').format(
+            self.image_url(filename, width), self._srcset(entry['variants'][entry['fallback']]),
+            sizes, entry['width'], entry['height']
+        )
+
+    def responsive_image(self, filename, alt='', sizes='100vw', width=None, **attrs):
+        """Balise <picture> : source WebP + <img> JPEG/PNG, chacune avec son srcset."""
+        extra = Markup(''.join(
+            Markup(' {}="{}"').format(nom.rstrip('_').replace('_', '-'), valeur) for nom, valeur in attrs.items()
+        ))
+        entry = self.manifest.get(filename)
+        if entry is None:
+            return Markup('<img src="{}" alt="{}"{}>').format(url_for('static', filename=filename), alt, extra)
+        return Markup(
+            '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+            '<img {} alt="{}"{}></picture>'
+        ).format(self._srcset(entry['variants']['webp']), sizes,
+                 self.image_srcset(filename, sizes, width), alt, extra)
+
+
+def init_app(app):
+    images = ResponsiveImages(app)
+    app.extensions['images'] = images
+    app.jinja_env.globals.update(
+        image_url=images.image_url,
+        image_srcset=images.image_srcset,
+        responsive_image=images.responsive_image,
+    )
+
+    @app.after_request
+    def cache_fichiers_empreintes(response):
+        # Un fichier de static/build avec un hash dans son nom ne change jamais. Le manifeste,
+        # réécrit sur place par `flask images-build`, garde le cache par défaut.
+        fichier = (request.view_args or {}).get('filename', '')
+        if (request.endpoint == 'static' and fichier.startswith('build/') and EMPREINTE.search(fichier)
+                and response.status_code in (200, 304)):
+            response.cache_control.public = True
+            response.cache_control.max_age = 31536000
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+        return response
+
+    @app.cli.command('images-build')
+    @click.option('--widths', default=None, help='Largeurs séparées par des virgules (ex: 320,640,1280).')
+    @click.option('--quality', default=80, show_default=True)
+    def images_build_command(widths, quality):
+        """Génère les variantes responsives et empreintées des images + le manifeste."""
+        largeurs = [int(w) for w in widths.split(',')] if widths else app.config.get('IMAGE_WIDTHS', (320, 640, 960, 1280, 1920))
+        manifest = build_images(app.static_folder, largeurs, quality)
+        images.reload()
+        avant = sum(os.path.getsize(os.path.join(app.static_folder, nom)) for nom in manifest)
+        for nom, entry in manifest.items():
+            tailles = ', '.join(f"{v['width']}w={v['bytes'] // 1024}Ko" for v in entry['variants']['webp'])
+            click.echo(f"{nom} : {tailles}")
+        click.echo(f"{len(manifest)} image(s), originaux : {avant // 1024} Ko.")
+
+    @app.cli.command('images-prune')
+    @click.option('--days', default=7, show_default=True,
+                  help="Âge minimal (jours) d'une variante hors manifeste avant suppression.")
+    def images_prune_command(days):
+        """Supprime les variantes des builds précédents qui ne sont plus référencées."""
+        supprimes = prune_images(app.static_folder, days * 86400)
+        for nom in supprimes:
+            click.echo(nom)
+        click.echo(f"{len(supprimes)} fichier(s) supprimé(s).")
+
+    return images
+
@@ -0,0 +1,225 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Bornes des histogrammes de latence, en secondes
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    def __init__(self, nom, aide, labels, buckets=BUCKETS):
+        self.nom = nom
+        self.aide = aide
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, valeur, *labels):
+        with self._lock:
+            serie = self._series.get(labels)
+            if serie is None:
+                serie = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, borne in enumerate(self.buckets):
+                if valeur <= borne:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valeur
+            serie[2] += 1
+
+    def exposer(self):
+        lignes = [f"# HELP {self.nom} {self.aide}", f"# TYPE {self.nom} histogram"]
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        for labels, (compteurs, somme, nombre) in sorted(series.items()):
+            base = _labels(self.labels, labels)
+            cumul = 0
+            for borne, compteur in zip(self.buckets, compteurs):
+                cumul += compteur
+                lignes.append(f'{self.nom}_bucket{{{base},le="{borne}"}} {cumul}')
+            lignes.append(f'{self.nom}_bucket{{{base},le="+Inf"}} {nombre}')
+            lignes.append(f'{self.nom}_sum{{{base}}} {somme:.6f}')
+            lignes.append(f'{self.nom}_count{{{base}}} {nombre}')
+        return lignes
+
+
+class Counter:
+    def __init__(self, nom, aide, labels):
+        self.nom = nom
+        self.aide = aide
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, valeur=1, *labels):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + valeur
+
+    def exposer(self):
+        lignes = [f"# HELP {self.nom} {self.aide}", f"# TYPE {self.nom} counter"]
+        with self._lock:
+            series = dict(self._series)
+        for labels, valeur in sorted(series.items()):
+            lignes.append(f'{self.nom}{{{_labels(self.labels, labels)}}} {valeur:g}')
+        return lignes
+
+
+# Les métriques sont en mémoire, propres à chaque processus : sous gunicorn, chaque worker
+# a ses compteurs et /metrics répond avec ceux du worker qui reçoit la requête. Toutes les
+# séries portent donc un label pid (lu à l'exposition : celui du worker, pas du maître) :
+# chaque worker est une série distincte dont les compteurs restent monotones, mise à jour
+# quand un scrape tombe sur lui. Les totaux s'obtiennent en agrégeant sur pid, ex.
+# sum without (pid) (rate(dulcibelle_http_requests_total[5m])).
+# Les jauges lues en base (profondeur de l'outbox) sont identiques d'un worker à l'autre :
+# max without (pid). Un worker recyclé (max_requests) repart de zéro avec un nouveau pid.
+def _labels(noms, valeurs):
+    def echapper(valeur):
+        return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    paires = [('pid', os.getpid()), *zip(noms, valeurs)]
+    return ','.join(f'{nom}="{echapper(valeur)}"' for nom, valeur in paires)
+
+
+REQUEST_DURATION = Histogram('dulcibelle_http_request_duration_seconds',
+                             'Durée des requêtes HTTP par endpoint.', ('endpoint', 'method'))
+REQUESTS = Counter('dulcibelle_http_requests_total', 'Requêtes HTTP par endpoint et code.',
+                   ('endpoint', 'method', 'status'))
+DB_QUERIES = Counter('dulcibelle_db_queries_total', 'Requêtes SQL exécutées, par endpoint.', ('endpoint',))
+DB_DURATION = Counter('dulcibelle_db_query_seconds_total', 'Temps passé en SQL, par endpoint.', ('endpoint',))
+TEMPLATE_DURATION = Histogram('dulcibelle_template_render_seconds', 'Durée de rendu des templates.',
+                              ('template',))
+SMTP_DURATION = Histogram('dulcibelle_smtp_seconds', 'Durée des opérations SMTP (connexion, envoi).',
+                          ('operation',))
+SMTP_ERRORS = Counter('dulcibelle_smtp_errors_total', 'Erreurs SMTP par opération.', ('operation',))
+
+METRIQUES = [REQUEST_DURATION, REQUESTS, DB_QUERIES, DB_DURATION, TEMPLATE_DURATION, SMTP_DURATION, SMTP_ERRORS]
+
+_local = threading.local()
+
+
+def _endpoint():
+    if not has_request_context():
+        return 'arriere-plan'  # workers de l'outbox, commandes CLI
+    return request.endpoint or 'inconnu'
+
+
+def _ajouter(cle, valeur):
+    # Cumuls de la requête en cours, pour l'en-tête Server-Timing
+    if has_request_context() and '_metrics' in g:
+        g._metrics[cle] += valeur
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _debut_requete_sql(conn, cursor, statement, parameters, context, executemany):
+    # Par curseur : un début sans fin (requête en échec) ne peut pas fausser la suivante
+    conn.info.setdefault('metrics_debut', {})[id(cursor)] = time.perf_counter()
+
+
+def _compter_requete_sql(conn, cursor):
+    debut = conn.info.get('metrics_debut', {}).pop(id(cursor), None)
+    if debut is None:
+        return
+    duree = time.perf_counter() - debut
+    endpoint = _endpoint()
+    DB_QUERIES.inc(1, endpoint)
+    DB_DURATION.inc(duree, endpoint)
+    _ajouter('db', duree)
+    _ajouter('db_count', 1)
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _fin_requete_sql(conn, cursor, statement, parameters, context, executemany):
+    _compter_requete_sql(conn, cursor)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _echec_requete_sql(contexte):
+    # Requête en échec (database is locked, contrainte...) : after_cursor_execute n'est pas
+    # appelé, mais son début est retiré de la connexion (qui vit dans le pool) et son temps
+    # compté. SQLAlchemy 2.0 ne renseigne pas contexte.cursor : on passe par execution_context.
+    if contexte.connection is not None and contexte.execution_context is not None:
+        _compter_requete_sql(contexte.connection, contexte.execution_context.cursor)
+
+
+def _debut_template(sender, template, context, **extra):
+    _local.__dict__.setdefault('templates', []).append(time.perf_counter())
+
+
+def _fin_template(sender, template, context, **extra):
+    debuts = getattr(_local, 'templates', None)
+    if not debuts:
+        return
+    duree = time.perf_counter() - debuts.pop()
+    TEMPLATE_DURATION.observe(duree, template.name or 'inline')
+    # Seul le template de plus haut niveau compte (les rendus imbriqués y sont inclus)
+    if not debuts:
+        _ajouter('tpl', duree)
+
+
+@contextmanager
+def chronometre_smtp(operation):
+    """Mesure une opération SMTP (utilisé par l'outbox autour de connect() et send())."""
+    debut = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        SMTP_ERRORS.inc(1, operation)
+        raise
+    finally:
+        duree = time.perf_counter() - debut
+        SMTP_DURATION.observe(duree, operation)
+        _ajouter('smtp', duree)
+
+
+def jauge(nom, aide, labels, series, type_='gauge'):
+    """Lignes Prometheus d'une valeur lue à la demande (profondeur de l'outbox, compteurs des caches)."""
+    lignes = [f"# HELP {nom} {aide}", f"# TYPE {nom} {type_}"]
+    for valeurs, valeur in sorted(series.items()):
+        lignes.append(f'{nom}{{{_labels(labels, valeurs)}}} {valeur:g}')
+    return lignes
+
+
+def exposer(extra=()):
+    """Toutes les métriques au format texte Prometheus."""
+    lignes = []
+    for metrique in METRIQUES:
+        lignes.extend(metrique.exposer())
+    lignes.extend(extra)
+    return '\n'.join(lignes) + '\n'
+
+
+def reponse_prometheus(extra=()):
+    return Response(exposer(extra), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def init_app(app):
+    before_render_template.connect(_debut_template, app)
+    template_rendered.connect(_fin_template, app)
+
+    @app.before_request
+    def debut_mesure():
+        g._metrics = {'debut': time.perf_counter(), 'db': 0.0, 'db_count': 0, 'tpl': 0.0, 'smtp': 0.0}
+
+    @app.after_request
+    def fin_mesure(response):
+        mesures = g.pop('_metrics', None)
+        if mesures is None:
+            return response
+        duree = time.perf_counter() - mesures['debut']
+        endpoint = _endpoint()
+        REQUEST_DURATION.observe(duree, endpoint, request.method)
+        REQUESTS.inc(1, endpoint, request.method, response.status_code)
+        if app.config.get('SERVER_TIMING', True):
+            timings = [
+                f'app;dur={duree * 1000:.1f}',
+                f'db;dur={mesures["db"] * 1000:.1f};desc="{mesures["db_count"]} SQL"',
+                f'tpl;dur={mesures["tpl"] * 1000:.1f}',
+            ]
+            if mesures['smtp']:
+                timings.append(f'smtp;dur={mesures["smtp"] * 1000:.1f}')
+            response.headers.add('Server-Timing', ', '.join(timings))
+        return response
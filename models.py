@@ -1,7 +1,25 @@
 from extensions import db
 from datetime import datetime
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 class Commande(db.Model):
+    STATUTS = ['en attente', 'expédiée', 'annulée']
+    # Transitions autorisées : nouveau statut -> statuts de départ possibles.
+    # Une commande annulée est définitive (son stock a été remis en vente).
+    TRANSITIONS = {
+        'en attente': ['expédiée'],
+        'expédiée': ['en attente'],
+        'annulée': ['en attente'],
+    }
+
+    # Index de la pagination par curseur du tableau de bord (ORDER BY date_commande DESC, id DESC),
+    # avec ou sans filtre sur le statut
+    __table_args__ = (
+        db.Index('ix_commande_date_id', 'date_commande', 'id'),
+        db.Index('ix_commande_statut_date_id', 'statut', 'date_commande', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     nom = db.Column(db.String(50), nullable=False)
     prenom = db.Column(db.String(50), nullable=False)
@@ -12,10 +30,48 @@ class Commande(db.Model):
     statut = db.Column(db.String(20), default='en attente')
     email = db.Column(db.String(100), nullable=False)
     numero = db.Column(db.String(20), unique=True)
+    # Prix du produit au moment de la commande : le chiffre d'affaires ne dépend plus du prix actuel
+    prix_unitaire = db.Column(db.Float, nullable=True)
 
     def __repr__(self):
         return f'<Commande {self.nom} {self.prenom}>'
 
+    @classmethod
+    def changer_statuts(cls, condition, nouveau_statut):
+        """Change le statut de toutes les commandes qui vérifient `condition`, en requêtes ensemblistes.
+
+        Seules les commandes dont le statut actuel autorise la transition sont modifiées.
+        Pour une annulation, les quantités sont d'abord rendues au stock, et les agrégats
+        de ventes sont déplacés vers le nouveau statut, dans la même transaction (pas de
+        commit ici). Renvoie le nombre de commandes modifiées.
+        """
+        cible = db.and_(condition, cls.statut.in_(cls.TRANSITIONS[nouveau_statut]))
+        if nouveau_statut == 'annulée':
+            # Premier ordre de la transaction = écriture : SQLite prend le verrou d'écriture
+            # tout de suite, la somme et l'UPDATE suivant voient donc les mêmes lignes.
+            a_rendre = select(func.coalesce(func.sum(cls.quantite), 0)).where(cible).scalar_subquery()
+            db.session.execute(
+                update(Produit)
+                .where(Produit.id == select(func.min(Produit.id)).scalar_subquery())
+                .values(stock=Produit.stock + a_rendre)
+            )
+        VenteJournaliere.deplacer(cible, nouveau_statut)
+        result = db.session.execute(
+            update(cls).where(cible).values(statut=nouveau_statut)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    @classmethod
+    def numero_suivant(cls):
+        """Expression SQL du numéro CMD-année-000ID, calculée dans l'INSERT lui-même.
+
+        SQLite sérialise les écritures : pendant l'INSERT, MAX(id) + 1 est exactement
+        l'id attribué à la ligne, ce qui évite le flush + UPDATE d'avant.
+        """
+        prochain_id = select(func.coalesce(func.max(cls.id), 0) + 1).scalar_subquery()
+        return func.printf('CMD-%d-%04d', datetime.now().year, prochain_id)
+
 class Produit(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nom = db.Column(db.String(100), nullable=False, default="Sérum visage anti-tâches")
@@ -26,6 +82,21 @@ class Produit(db.Model):
     ingredients = db.Column(db.Text, nullable=True)
     utilisation = db.Column(db.Text, nullable=True)
 
+    @classmethod
+    def reserver_stock(cls, quantite):
+        """Décrémente le stock en un seul UPDATE conditionnel.
+
+        Renvoie True si le stock a été réservé, False s'il est insuffisant. Pas de
+        lecture préalable en Python, donc pas de mise à jour perdue entre deux commandes.
+        """
+        produit_id = select(func.min(cls.id)).scalar_subquery()
+        result = db.session.execute(
+            update(cls)
+            .where(cls.id == produit_id, cls.stock >= quantite)
+            .values(stock=cls.stock - quantite)
+        )
+        return result.rowcount == 1
+
 class Admin(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
@@ -37,4 +108,105 @@ class Admin(db.Model):
 
     def check_password(self, password):
         from werkzeug.security import check_password_hash
-        return check_password_hash(self.password_hash, password)
\ No newline at end of file
+        return check_password_hash(self.password_hash, password)
+
+class VenteJournaliere(db.Model):
+    """Agrégats de ventes par jour et par statut, tenus à jour à chaque commande et changement de statut.
+
+    Le chiffre d'affaires est calculé avec le prix unitaire enregistré sur chaque commande,
+    les agrégats incrémentaux restent donc exacts après un changement de prix. Une commande
+    sans prix unitaire (insérée hors de l'application) est comptée au prix actuel.
+    """
+    __tablename__ = 'vente_journaliere'
+
+    jour = db.Column(db.Date, primary_key=True)
+    statut = db.Column(db.String(20), primary_key=True)
+    commandes = db.Column(db.Integer, nullable=False, default=0)
+    unites = db.Column(db.Integer, nullable=False, default=0)
+    chiffre_affaires = db.Column(db.Float, nullable=False, default=0)
+
+    @classmethod
+    def _upsert(cls, valeurs=None, select_=None):
+        # INSERT ... ON CONFLICT(jour, statut) DO UPDATE : ajoute aux compteurs existants
+        insert = sqlite_insert(cls)
+        insert = insert.values(valeurs) if select_ is None else insert.from_select(
+            ['jour', 'statut', 'commandes', 'unites', 'chiffre_affaires'], select_)
+        return insert.on_conflict_do_update(
+            index_elements=['jour', 'statut'],
+            set_={
+                'commandes': cls.commandes + insert.excluded.commandes,
+                'unites': cls.unites + insert.excluded.unites,
+                'chiffre_affaires': cls.chiffre_affaires + insert.excluded.chiffre_affaires,
+            }
+        )
+
+    @staticmethod
+    def _montant():
+        # Montant de chaque commande, au prix payé (prix actuel pour les anciennes commandes)
+        prix_actuel = select(func.min(Produit.prix)).scalar_subquery()
+        return Commande.quantite * func.coalesce(Commande.prix_unitaire, prix_actuel, 0)
+
+    @classmethod
+    def ajouter_commande(cls, commande):
+        db.session.execute(cls._upsert(valeurs={
+            'jour': commande.date_commande.date(), 'statut': commande.statut, 'commandes': 1,
+            'unites': commande.quantite, 'chiffre_affaires': commande.quantite * (commande.prix_unitaire or 0),
+        }))
+
+    @classmethod
+    def deplacer(cls, cible, nouveau_statut):
+        """Retire des agrégats de leur statut actuel les commandes `cible` et les ajoute au nouveau.
+
+        À appeler AVANT l'UPDATE des commandes : deux INSERT ... SELECT groupés par jour,
+        le coût dépend du nombre de jours touchés, pas du nombre de commandes.
+        """
+        jour = func.date(Commande.date_commande)
+        unites = func.sum(Commande.quantite)
+        montant = func.sum(cls._montant())
+        db.session.execute(cls._upsert(select_=(
+            select(jour, Commande.statut, -func.count(Commande.id), -unites, -montant)
+            .where(cible)
+            .group_by(jour, Commande.statut)
+        )))
+        db.session.execute(cls._upsert(select_=(
+            select(jour, literal(nouveau_statut), func.count(Commande.id), unites, montant)
+            .where(cible)
+            .group_by(jour)
+        )))
+
+    @classmethod
+    def recalculer(cls):
+        """Recalcule tous les agrégats depuis la table commande (réparation / premier remplissage)."""
+        jour = func.date(Commande.date_commande)
+        unites = func.sum(Commande.quantite)
+        db.session.execute(cls.__table__.delete())
+        db.session.execute(cls._upsert(select_=(
+            select(jour, Commande.statut, func.count(Commande.id), unites, func.sum(cls._montant()))
+            .where(Commande.date_commande.isnot(None))
+            .group_by(jour, Commande.statut)
+        )))
+
+
+class EmailOutbox(db.Model):
+    """File d'attente persistante des emails (écrite dans la même transaction que la commande)."""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_statut_prochain_essai', 'statut', 'prochain_essai'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(30), nullable=False)  # 'confirmation' ou 'admin'
+    commande_id = db.Column(db.Integer, db.ForeignKey('commande.id'), nullable=False)
+    statut = db.Column(db.String(20), nullable=False, default='en attente')  # en attente / en cours / envoyé / échec
+    tentatives = db.Column(db.Integer, nullable=False, default=0)
+    prochain_essai = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    verrou = db.Column(db.String(32), nullable=True)  # identifiant du worker qui traite l'email
+    date_verrou = db.Column(db.DateTime, nullable=True)
+    derniere_erreur = db.Column(db.Text, nullable=True)
+    date_creation = db.Column(db.DateTime, default=datetime.utcnow)
+    date_envoi = db.Column(db.DateTime, nullable=True)
+
+    commande = db.relationship('Commande')
+
+    def __repr__(self):
+        return f'<EmailOutbox {self.type} commande={self.commande_id} {self.statut}>'
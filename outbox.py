@@ -0,0 +1,283 @@
+import smtplib
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+
+import click
+from flask_mail import Connection
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import selectinload
+
+from emails import BUILDERS
+from extensions import db
+from metrics import chronometre_smtp
+from models import EmailOutbox
+
+
+def enqueue_commande_emails(commande):
+    """Ajoute les emails d'une commande à la file d'attente.
+
+    Pas de commit ici : les lignes partent dans la même transaction que la commande,
+    donc une commande enregistrée a toujours ses emails en attente (et inversement).
+    """
+    for type_email in ('confirmation', 'admin'):
+        db.session.add(EmailOutbox(type=type_email, commande=commande))
+
+
+def queue_depth():
+    """Nombre d'emails par statut, ex: {'en attente': 3, 'envoyé': 120}."""
+    rows = db.session.execute(
+        select(EmailOutbox.statut, func.count(EmailOutbox.id)).group_by(EmailOutbox.statut)
+    ).all()
+    return {statut: total for statut, total in rows}
+
+
+class ConnexionSMTP(Connection):
+    """Connexion Flask-Mail avec un timeout réseau : Flask-Mail n'en pose aucun, et un relais
+    muet bloquerait le worker indéfiniment avec le lot réservé."""
+
+    def __init__(self, mail, timeout):
+        super().__init__(mail)
+        self.timeout = timeout
+
+    def configure_host(self):
+        classe = smtplib.SMTP_SSL if self.mail.use_ssl else smtplib.SMTP
+        host = classe(self.mail.server, self.mail.port, timeout=self.timeout)
+        host.set_debuglevel(int(self.mail.debug))
+        if self.mail.use_tls:
+            host.starttls()
+        if self.mail.username and self.mail.password:
+            host.login(self.mail.username, self.mail.password)
+        return host
+
+
+class OutboxWorkerPool:
+    """Pool de threads qui vide la table email_outbox en arrière-plan.
+
+    Chaque worker réserve un lot d'emails (UPDATE conditionnel, sûr entre plusieurs
+    processus), ouvre UNE connexion SMTP pour tout le lot, puis reprogramme les échecs
+    avec un délai exponentiel.
+    """
+
+    def __init__(self, app, mail):
+        self.app = app
+        self.mail = mail
+        self._threads = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.configure()
+
+    def configure(self):
+        # Relu au démarrage pour tenir compte de la config modifiée après init_app
+        config = self.app.config
+        self.workers = config.get('OUTBOX_WORKERS', 2)
+        self.batch_size = config.get('OUTBOX_BATCH_SIZE', 20)
+        self.poll_interval = config.get('OUTBOX_POLL_INTERVAL', 2.0)
+        self.max_attempts = config.get('OUTBOX_MAX_ATTEMPTS', 5)
+        self.backoff = config.get('OUTBOX_BACKOFF', 30)  # secondes, doublé à chaque essai
+        self.lock_timeout = config.get('OUTBOX_LOCK_TIMEOUT', 300)
+        self.smtp_timeout = config.get('OUTBOX_SMTP_TIMEOUT', 30)  # secondes, par opération réseau
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self.configure()
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'outbox-worker-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for t in self._threads:
+                t.start()
+        self.app.logger.info(f"Outbox : {self.workers} worker(s) démarré(s)")
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    traites = self.process_batch()
+                except Exception as e:
+                    self.app.logger.error(f"Outbox : erreur du worker : {e}")
+                    traites = 0
+                finally:
+                    db.session.remove()
+            if not traites:
+                self._stop.wait(self.poll_interval)
+
+    def _claim(self):
+        """Réserve un lot d'emails à envoyer et le renvoie (nécessite un contexte d'application)."""
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        disponible = or_(
+            and_(EmailOutbox.statut == 'en attente', EmailOutbox.prochain_essai <= now),
+            # verrou abandonné par un worker arrêté brutalement
+            and_(EmailOutbox.statut == 'en cours',
+                 EmailOutbox.date_verrou < now - timedelta(seconds=self.lock_timeout)),
+        )
+        ids = select(EmailOutbox.id).where(disponible).order_by(EmailOutbox.id).limit(self.batch_size)
+        # La condition est répétée dans l'UPDATE : si un autre worker a pris la ligne entre-temps,
+        # elle n'est plus "disponible" et n'est pas réservée deux fois.
+        db.session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(ids.scalar_subquery()), disponible)
+            .values(statut='en cours', verrou=token, date_verrou=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        # Les commandes sont chargées tout de suite : aucune requête (ni autoflush) pendant l'envoi
+        return EmailOutbox.query.options(selectinload(EmailOutbox.commande)) \
+            .filter_by(verrou=token, statut='en cours').order_by(EmailOutbox.id).all()
+
+    def _prolonger_verrou(self, token):
+        """Repousse date_verrou des emails du lot. Renvoie False si le lot a été repris entre-temps."""
+        resultat = db.session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.verrou == token, EmailOutbox.statut == 'en cours')
+            .values(date_verrou=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return resultat.rowcount > 0
+
+    def _reprogrammer(self, entry, erreur, definitif=False):
+        """Valeurs à écrire pour un email non envoyé : nouvel essai plus tard, ou abandon."""
+        tentatives = entry.tentatives + 1
+        valeurs = {'tentatives': tentatives, 'derniere_erreur': str(erreur), 'verrou': None}
+        if definitif or tentatives >= self.max_attempts:
+            valeurs['statut'] = 'échec'
+            self.app.logger.error(f"Outbox : abandon de l'email {entry.id} après {tentatives} essai(s) : {erreur}")
+        else:
+            delai = self.backoff * 2 ** (tentatives - 1)
+            valeurs.update(statut='en attente', prochain_essai=datetime.utcnow() + timedelta(seconds=delai))
+            self.app.logger.warning(f"Outbox : email {entry.id} reprogrammé dans {delai}s : {erreur}")
+        return valeurs
+
+    def process_batch(self):
+        """Envoie un lot d'emails. Renvoie le nombre d'emails traités (0 si la file est vide).
+
+        Aucune écriture en base pendant le dialogue SMTP, hormis la prolongation du verrou
+        (UPDATE court) quand le lot dure : les messages sont construits avant d'ouvrir la
+        connexion, les résultats gardés en mémoire, et les statuts écrits en une seule
+        transaction courte après. Un relais SMTP lent ne bloque donc jamais les commandes
+        (SQLite n'a qu'un écrivain à la fois), et son lot n'est pas repris par un autre worker.
+        """
+        entries = self._claim()
+        if not entries:
+            return 0
+        token = entries[0].verrou
+
+        messages, erreurs, abandons = {}, {}, {}
+        for entry in entries:
+            try:
+                msg = BUILDERS[entry.type](entry.commande)
+            except Exception as e:
+                erreurs[entry.id] = e
+                continue
+            if msg is None:
+                # Destinataire non configuré (ADMIN_EMAIL) : réessayer ne changerait rien
+                abandons[entry.id] = f"email '{entry.type}' sans destinataire configuré"
+            else:
+                messages[entry.id] = msg
+        db.session.commit()  # fin de la transaction de lecture avant le réseau
+
+        envoyes = {}
+        prolonge = time.monotonic()
+        try:
+            with ExitStack() as pile:
+                # La connexion SMTP s'ouvre à l'entrée du contexte : c'est là qu'on la mesure
+                with chronometre_smtp('connect'):
+                    conn = pile.enter_context(ConnexionSMTP(self.app.extensions['mail'], self.smtp_timeout))
+                for entry_id, msg in messages.items():
+                    # Bien avant OUTBOX_LOCK_TIMEOUT, sinon un autre worker reprendrait le lot et l'enverrait aussi
+                    if time.monotonic() - prolonge > self.lock_timeout / 4:
+                        if not self._prolonger_verrou(token):
+                            break
+                        prolonge = time.monotonic()
+                    try:
+                        with chronometre_smtp('send'):
+                            conn.send(msg)
+                        envoyes[entry_id] = datetime.utcnow()
+                    except Exception as e:
+                        erreurs[entry_id] = e
+        except Exception as e:
+            # Connexion SMTP impossible (ou coupée) : tout ce qui n'est pas parti est reprogrammé
+            for entry_id in messages:
+                if entry_id not in envoyes:
+                    erreurs.setdefault(entry_id, e)
+
+        for entry in entries:
+            if entry.id in envoyes:
+                valeurs = {'statut': 'envoyé', 'date_envoi': envoyes[entry.id], 'verrou': None}
+            elif entry.id in abandons:
+                valeurs = self._reprogrammer(entry, abandons[entry.id], definitif=True)
+            elif entry.id in erreurs:
+                valeurs = self._reprogrammer(entry, erreurs[entry.id])
+            else:
+                continue  # lot repris par un autre worker avant l'envoi : il n'est plus à nous
+            # Conditionnel au verrou : une ligne reprise par un autre worker n'est jamais écrasée
+            db.session.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id == entry.id, EmailOutbox.verrou == token)
+                .values(**valeurs)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+        return len(entries)
+
+    def drain(self):
+        """Vide la file de façon synchrone (tests, commande CLI). Renvoie le nombre d'emails traités."""
+        total = 0
+        while True:
+            traites = self.process_batch()
+            if not traites:
+                return total
+            total += traites
+
+
+def init_app(app, mail):
+    pool = OutboxWorkerPool(app, mail)
+    app.extensions['outbox'] = pool
+
+    # Démarrage paresseux : les threads naissent dans le processus qui sert les requêtes
+    # (après le fork de gunicorn ou du reloader), jamais à l'import.
+    @app.before_request
+    def start_outbox_workers():
+        if not pool.running and app.config.get('OUTBOX_AUTOSTART', True):
+            pool.start()
+
+    @app.cli.command('outbox-worker')
+    def outbox_worker_command():
+        """Lance le pool d'envoi des emails au premier plan."""
+        pool.start()
+        click.echo(f"{pool.workers} worker(s) actif(s), Ctrl+C pour arrêter.")
+        try:
+            while pool.running:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pool.stop()
+
+    @app.cli.command('outbox-drain')
+    def outbox_drain_command():
+        """Envoie tous les emails en attente puis s'arrête."""
+        click.echo(f"{pool.drain()} email(s) traité(s).")
+
+    @app.cli.command('outbox-status')
+    def outbox_status_command():
+        """Affiche le nombre d'emails par statut."""
+        for statut, total in sorted(queue_depth().items()):
+            click.echo(f"{statut} : {total}")
+
+    return pool
@@ -0,0 +1,89 @@
+import hashlib
+import json
+from functools import wraps
+
+from flask import Response, current_app, g, request, session
+
+from cache import MISS, Cache, backend_from_url
+
+
+def _messages_en_attente():
+    # Sans cookie de session il ne peut pas y avoir de message flash : on évite alors
+    # de toucher à la session (ce qui ajouterait "Vary: Cookie" à la réponse).
+    if current_app.config['SESSION_COOKIE_NAME'] not in request.cookies:
+        return False
+    return bool(session.get('_flashes'))
+
+
+def _cle(vary, params):
+    # request.path et non full_path : un paramètre inconnu ne crée jamais de nouvelle entrée
+    parties = [current_app.config.get('PAGE_CACHE_VERSION', ''), request.endpoint, request.path]
+    parties.extend(f"{nom}={request.args.get(nom, '')}" for nom in params)
+    if vary is not None:
+        parties.append(json.dumps(vary(), sort_keys=True, default=str))
+    return 'page:' + hashlib.sha1('|'.join(parties).encode('utf-8')).hexdigest()
+
+
+def _cachable(response):
+    # Jamais de page contenant un jeton CSRF (propre à la session) ou un message flash
+    # (afficher ou ajouter un message modifie la session)
+    if response.status_code != 200 or response.direct_passthrough:
+        return False
+    field_name = current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token')
+    if field_name in g or session.modified or 'Set-Cookie' in response.headers:
+        return False
+    return True
+
+
+def _reponse(entry):
+    response = Response(entry['body'], mimetype=entry['mimetype'])
+    response.set_etag(entry['etag'])  # ETag fort : hash du contenu, identique sur tous les workers
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get('PAGE_CACHE_MAX_AGE', 300)
+    return response.make_conditional(request)
+
+
+def cached_page(vary=None, params=()):
+    """Met en cache la page rendue par la vue (opt-in, route par route).
+
+    `vary` est une fonction optionnelle dont le résultat (sérialisable en JSON) fait partie
+    de la clé : la page est re-rendue dès qu'il change (ex: les champs du produit affiché).
+    `params` liste les paramètres d'URL dont dépend la page ; une requête portant un autre
+    paramètre est servie sans cache (sinon chaque ?x=1, ?x=2... ajouterait une entrée).
+    Les réponses portent un ETag fort et Cache-Control, un If-None-Match reçoit un 304.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_app.config.get('PAGE_CACHE_ENABLED', True) \
+                    or request.method not in ('GET', 'HEAD') or _messages_en_attente() \
+                    or any(nom not in params for nom in request.args):
+                return f(*args, **kwargs)
+
+            cache = current_app.extensions['page_cache']
+            cle = _cle(vary, params)
+            entry = cache.get(cle)
+            if entry is MISS:
+                response = current_app.make_response(f(*args, **kwargs))
+                if not _cachable(response):
+                    return response
+                body = response.get_data(as_text=True)
+                entry = {
+                    'body': body,
+                    'mimetype': response.mimetype,
+                    'etag': hashlib.sha256(body.encode('utf-8')).hexdigest(),
+                }
+                cache.set(cle, entry)
+            return _reponse(entry)
+        return decorated_function
+    return decorator
+
+
+def init_app(app):
+    cache = Cache(
+        backend_from_url(app.config.get('PAGE_CACHE_URL') or app.config.get('CACHE_URL'),
+                         app.config.get('PAGE_CACHE_MAX_ENTRIES', 512)),
+        ttl=app.config.get('PAGE_CACHE_TTL', 3600)
+    )
+    app.extensions['page_cache'] = cache
+    return cache
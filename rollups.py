@@ -0,0 +1,74 @@
+import time
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import select
+
+from extensions import db
+from models import VenteJournaliere
+
+
+class Periode:
+    """Intervalle de jours de la page statistiques (30 derniers jours par défaut)."""
+
+    def __init__(self, debut, fin):
+        self.debut = debut
+        self.fin = fin
+
+    @classmethod
+    def depuis_args(cls, args, jours=30):
+        fin = _lire_jour(args.get('au')) or datetime.utcnow().date()
+        debut = _lire_jour(args.get('du')) or fin - timedelta(days=jours - 1)
+        return cls(min(debut, fin), max(debut, fin))
+
+
+def _lire_jour(valeur):
+    try:
+        return datetime.strptime(valeur, '%Y-%m-%d').date() if valeur else None
+    except ValueError:
+        return None
+
+
+def statistiques(periode):
+    """Ventes par jour sur la période, lues uniquement dans vente_journaliere.
+
+    Une ligne par jour et par statut au plus : le coût dépend de la longueur de la
+    période, jamais du nombre total de commandes.
+    """
+    lignes = db.session.scalars(
+        select(VenteJournaliere)
+        .where(VenteJournaliere.jour >= periode.debut, VenteJournaliere.jour <= periode.fin)
+        .order_by(VenteJournaliere.jour.desc())
+    ).all()
+
+    jours = {}
+    total = {'commandes': 0, 'unites': 0, 'chiffre_affaires': 0.0, 'par_statut': {}}
+    for ligne in lignes:
+        if not ligne.commandes:
+            continue
+        jour = jours.setdefault(ligne.jour, {
+            'jour': ligne.jour, 'commandes': 0, 'unites': 0, 'chiffre_affaires': 0.0, 'par_statut': {},
+        })
+        for agregat in (jour, total):
+            agregat['par_statut'][ligne.statut] = agregat['par_statut'].get(ligne.statut, 0) + ligne.commandes
+            agregat['commandes'] += ligne.commandes
+            # Les commandes annulées ne comptent ni dans les unités vendues ni dans le CA
+            if ligne.statut != 'annulée':
+                agregat['unites'] += ligne.unites
+                agregat['chiffre_affaires'] += ligne.chiffre_affaires
+    return {'jours': list(jours.values()), 'total': total}
+
+
+def recalculer_agregats():
+    VenteJournaliere.recalculer()
+    db.session.commit()
+
+
+def init_app(app):
+    @app.cli.command('rollups-rebuild')
+    def rollups_rebuild_command():
+        """Recalcule les agrégats de ventes journaliers depuis la table commande."""
+        debut = time.perf_counter()
+        recalculer_agregats()
+        nombre = db.session.query(VenteJournaliere).count()
+        click.echo(f"{nombre} agrégat(s) recalculé(s) en {time.perf_counter() - debut:.1f}s.")
@@ -0,0 +1,324 @@
+import hmac
+import os
+from datetime import datetime
+from functools import wraps
+
+from flask import render_template, request, redirect, url_for, jsonify, current_app, session, flash, abort
+
+import catalog
+import dashboard
+import export
+import metrics
+import outbox
+import rollups
+import search
+from extensions import db
+from models import Commande, Admin, Produit, VenteJournaliere
+from pagecache import cached_page
+
+
+def champs_produit_affiches():
+    # Ce que les pages affichent du produit : tout sauf le stock, qui change à chaque commande
+    produit = catalog.get_produit()
+    return {k: v for k, v in produit.items() if k != 'stock'} if produit else None
+
+
+# Décorateur pour protéger les routes admin
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get('admin_logged_in'):
+            flash('Veuillez vous connecter pour accéder à cette page.', 'danger')
+            return redirect(url_for('admin_login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def init_app(app):
+    # Route pour la page d'accueil
+    @app.route('/')
+    @cached_page(vary=champs_produit_affiches)
+    def index():
+        produit = catalog.get_produit()
+        return render_template('landing.html', produit=produit, active_page='index')
+
+    # Route pour traiter la commande
+
+    @app.route('/produit')
+    @cached_page(vary=champs_produit_affiches)
+    def produit():
+        produit = catalog.get_produit()
+        return render_template('produit.html', produit=produit, active_page='produit')
+
+    @app.route('/commander')
+    def commander_page():
+        produit = catalog.get_produit()
+        return render_template('commande.html', produit=produit)
+
+    @app.route('/commander', methods=['POST'])
+    def commander():
+        # Récupération des données du formulaire
+        nom = request.form['nom']
+        prenom = request.form['prenom']
+        adresse = request.form['adresse']
+        telephone = request.form['telephone']
+        quantite = request.form['quantite']
+        email = request.form['email']
+
+        # Validations
+        erreurs = []
+        if not nom or not prenom:
+            erreurs.append("Le nom et le prénom sont obligatoires.")
+        if not email or '@' not in email:
+            erreurs.append("Email invalide.")
+        if not telephone or not telephone.isdigit() or len(telephone) < 10:
+            erreurs.append("Téléphone invalide (10 chiffres minimum).")
+        if not adresse or len(adresse) < 10:
+            erreurs.append("Adresse trop courte.")
+        try:
+            quantite = int(quantite)
+            if quantite < 1 or quantite > 10:
+                erreurs.append("Quantité doit être entre 1 et 10.")
+        except ValueError:
+            erreurs.append("Quantité invalide.")
+
+        if erreurs:
+            for err in erreurs:
+                flash(err, 'danger')
+            return redirect(url_for('commander_page'))
+
+        # Réservation atomique du stock (UPDATE ... WHERE stock >= quantite)
+        if not Produit.reserver_stock(quantite):
+            db.session.rollback()
+            flash("Désolé, stock insuffisant.", 'danger')
+            return redirect(url_for('commander_page'))
+
+        # Sinon, on crée la commande
+        # Création d'un objet Commande
+        nouvelle_commande = Commande(
+            nom=nom,
+            prenom=prenom,
+            email=email,
+            adresse=adresse,
+            telephone=telephone,
+            quantite=quantite,
+            statut='en attente',
+            date_commande=datetime.utcnow(),
+            prix_unitaire=catalog.get_produit()['prix'],
+            # Génération du numéro : CMD-année-000ID, directement dans l'INSERT
+            numero=Commande.numero_suivant()
+        )
+
+        # Ajout à la base de données
+        db.session.add(nouvelle_commande)
+        # Les emails sont mis en file d'attente dans la même transaction, l'envoi SMTP
+        # se fait en arrière-plan (voir outbox.py)
+        outbox.enqueue_commande_emails(nouvelle_commande)
+        # Agrégats de ventes du jour, mis à jour dans la même transaction
+        VenteJournaliere.ajouter_commande(nouvelle_commande)
+        db.session.flush()
+        commande_id = nouvelle_commande.id  # lu avant le commit, qui expire l'objet
+        db.session.commit()
+
+        flash('Commande enregistrée avec succès !', 'success')
+        # Redirection vers la page de confirmation
+        return redirect(url_for('confirmation', commande_id=commande_id))
+
+
+    # Route de confirmation
+    @app.route('/confirmation/<int:commande_id>')
+    def confirmation(commande_id):
+        commande = Commande.query.get_or_404(commande_id)
+        return render_template('confirmation.html', commande=commande)
+
+    @app.route('/histoire')
+    @cached_page()
+    def histoire():
+        return render_template('histoire.html', active_page='histoire')
+
+    @app.route('/contact')
+    @cached_page()
+    def contact():
+        return render_template('contact.html', active_page='contact')
+
+    # Routes pour les pages légales
+    @app.route('/mentions-legales')
+    @cached_page()
+    def mentions():
+        return render_template('mentions.html')
+
+    @app.route('/cgv')
+    @cached_page()
+    def cgv():
+        return render_template('cgv.html', active_page='cgv')
+
+    @app.route('/faq')
+    @cached_page()
+    def faq():
+        return render_template('faq.html', active_page='faq')
+
+
+    @app.route('/admin/login', methods=['GET', 'POST'])
+    def admin_login():
+        if request.method == 'POST':
+            username = request.form['username']
+            password = request.form['password']
+            admin = Admin.query.filter_by(username=username).first()
+            if admin and admin.check_password(password):
+                session['admin_logged_in'] = True
+                flash('Connexion réussie.', 'success')
+                return redirect(url_for('admin_dashboard'))
+            else:
+                flash('Identifiants incorrects.', 'danger')
+        return render_template('admin_login.html')
+
+    @app.route('/admin/logout')
+    def admin_logout():
+        session.pop('admin_logged_in', None)
+        flash('Vous êtes déconnecté.', 'info')
+        return redirect(url_for('admin_login'))
+
+    @app.route('/admin/dashboard')
+    @login_required
+    def admin_dashboard():
+        # Pagination par curseur (10 commandes par page), filtres par statut et par date
+        filtres = dashboard.Filtres.depuis_args(request.args)
+        commandes = dashboard.paginer_commandes(
+            filtres,
+            apres=request.args.get('apres'),
+            avant=request.args.get('avant'),
+            per_page=10
+        )
+        return render_template('admin_dashboard.html', commandes=commandes, filtres=filtres,
+                               statuts=Commande.STATUTS)
+
+    @app.route('/admin/export')
+    @login_required
+    def admin_export():
+        # Export en streaming (CSV ou NDJSON), avec les mêmes filtres que le tableau de bord
+        format_ = request.args.get('format', 'csv')
+        if format_ not in export.FORMATS:
+            flash("Format d'export invalide.", 'danger')
+            return redirect(url_for('admin_dashboard'))
+        return export.exporter_commandes(dashboard.Filtres.depuis_args(request.args), format_)
+
+    @app.route('/admin/statistiques')
+    @login_required
+    def admin_statistiques():
+        # Lit uniquement les agrégats journaliers : le coût ne dépend pas de l'historique
+        periode = rollups.Periode.depuis_args(request.args)
+        return render_template('admin_statistiques.html', periode=periode,
+                               stats=rollups.statistiques(periode), statuts=Commande.STATUTS)
+
+    @app.route('/admin/recherche')
+    @login_required
+    def admin_recherche():
+        # Recherche par nom, prénom, email, téléphone, adresse ou numéro (préfixes acceptés)
+        q = request.args.get('q', '').strip()
+        commandes = search.rechercher_commandes(q) if q else []
+        return render_template('admin_recherche.html', q=q, commandes=commandes)
+
+    @app.route('/admin/commande/<int:id>')
+    @login_required
+    def admin_commande_detail(id):
+        commande = Commande.query.get_or_404(id)
+        return render_template('admin_commande_detail.html', commande=commande)
+
+    @app.route('/admin/commande/<int:id>/statut', methods=['POST'])
+    @login_required
+    def admin_changer_statut(id):
+        commande = Commande.query.get_or_404(id)
+        nouveau_statut = request.form['statut']
+        if nouveau_statut not in Commande.STATUTS:
+            flash('Statut invalide.', 'danger')
+        elif nouveau_statut == commande.statut:
+            flash('Statut inchangé.', 'info')
+        elif Commande.changer_statuts(Commande.id == id, nouveau_statut):
+            db.session.commit()
+            dashboard.invalider_totaux()
+            flash('Statut mis à jour.', 'success')
+        else:
+            db.session.rollback()
+            flash(f"Impossible de passer une commande « {commande.statut} » en « {nouveau_statut} ».", 'danger')
+        return redirect(url_for('admin_commande_detail', id=id))
+
+    @app.route('/admin/commandes/statut', methods=['POST'])
+    @login_required
+    def admin_changer_statuts():
+        # Changement de statut en masse : les commandes cochées, ou toutes celles des filtres
+        # du tableau de bord. Deux UPDATE au plus, quel que soit le nombre de commandes.
+        nouveau_statut = request.form.get('nouveau_statut')
+        filtres = dashboard.Filtres.depuis_args(request.form)
+        ids = request.form.getlist('ids', type=int)
+        if nouveau_statut not in Commande.STATUTS:
+            flash('Statut invalide.', 'danger')
+        elif not ids and not (request.form.get('tout') and filtres.args()):
+            flash('Sélectionnez des commandes ou au moins un filtre.', 'danger')
+        else:
+            condition = Commande.id.in_(ids) if ids else db.and_(*filtres.conditions())
+            modifiees = Commande.changer_statuts(condition, nouveau_statut)
+            db.session.commit()
+            dashboard.invalider_totaux()
+            flash(f"{modifiees} commande(s) passée(s) en « {nouveau_statut} ».", 'success' if modifiees else 'info')
+        return redirect(url_for('admin_dashboard', **filtres.args()))
+
+    @app.route('/admin/outbox')
+    @login_required
+    def admin_outbox():
+        # Profondeur de la file d'attente des emails, par statut
+        return jsonify(outbox.queue_depth())
+
+    @app.route('/admin/cache')
+    @login_required
+    def admin_cache():
+        # Compteurs hits/misses du cache produit (propres à ce worker)
+        return jsonify(current_app.extensions['catalog'].stats())
+
+    @app.route('/metrics')
+    def admin_metrics():
+        # Session admin, ou jeton `Authorization: Bearer <METRICS_TOKEN>` pour le scraper Prometheus
+        token = current_app.config.get('METRICS_TOKEN')
+        fourni = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not session.get('admin_logged_in') and not (token and hmac.compare_digest(fourni, token)):
+            abort(403)
+        extra = metrics.jauge('dulcibelle_outbox_emails', "Emails dans l'outbox, par statut.",
+                              ('statut',), {(statut,): n for statut, n in outbox.queue_depth().items()})
+        caches = {nom: current_app.extensions[nom].stats() for nom in ('catalog', 'page_cache')}
+        for compteur in ('hits', 'misses'):
+            extra += metrics.jauge(f'dulcibelle_cache_{compteur}_total', f'{compteur.capitalize()} des caches de ce worker.',
+                                   ('cache',), {(nom,): stats[compteur] for nom, stats in caches.items()}, 'counter')
+        return metrics.reponse_prometheus(extra)
+
+    @app.errorhandler(404)
+    def page_not_found(e):
+        return render_template('404.html'), 404
+
+    @app.errorhandler(500)
+    def internal_server_error(e):
+        return render_template('500.html'), 500
+
+    @app.route('/debug-templates')
+    def debug_templates():
+        template_dir = os.path.join(app.root_path, 'templates')
+        if os.path.exists(template_dir):
+            files = os.listdir(template_dir)
+            return f"Fichiers dans templates : {files}"
+        else:
+            return "Le dossier templates n'existe pas !"
+
+    @app.route('/debug-mail-config')
+    def debug_mail_config():
+        config = {
+            'MAIL_SERVER': app.config.get('MAIL_SERVER'),
+            'MAIL_PORT': app.config.get('MAIL_PORT'),
+            'MAIL_USE_SSL': app.config.get('MAIL_USE_SSL'),
+            'MAIL_USE_TLS': app.config.get('MAIL_USE_TLS'),
+            'MAIL_USERNAME': app.config.get('MAIL_USERNAME'),
+            'MAIL_DEFAULT_SENDER': app.config.get('MAIL_DEFAULT_SENDER'),
+        }
+        return str(config)
+
+    @app.errorhandler(400)
+    def csrf_error(error):
+        flash('Le formulaire a expiré ou est invalide. Veuillez réessayer.', 'danger')
+        return redirect(request.referrer or url_for('index'))
@@ -0,0 +1,162 @@
+import re
+import time
+
+import click
+from sqlalchemy import event, text
+
+from extensions import db
+from models import Commande
+
+COLONNES = ('nom', 'prenom', 'email', 'telephone', 'adresse', 'numero')
+
+# Pendant une reconstruction, id de la dernière commande déjà réindexée
+PROGRESSION = 'commande_fts_progression'
+TAILLE_LOT = 20000
+
+
+def _ddl_index(progression=False):
+    """Table FTS5 et triggers de synchronisation.
+
+    Index FTS5 "external content" : le texte reste dans la table commande, l'index ne stocke
+    que les tokens. prefix='2 3' pré-indexe les préfixes courts pour les recherches "dup*".
+    Avec `progression`, les triggers ignorent les commandes pas encore réindexées : elles
+    le seront par la reconstruction, avec leur valeur du moment.
+    """
+    colonnes = ', '.join(COLONNES)
+
+    def quand(ligne):
+        return f" WHEN {ligne}.id <= (SELECT id_max FROM {PROGRESSION})" if progression else ''
+
+    def valeurs(ligne):
+        return ', '.join(f'{ligne}.{c}' for c in COLONNES)
+
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS commande_fts USING fts5(
+            {colonnes},
+            content='commande', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )""",
+        # Synchronisation par triggers : couvre aussi les UPDATE/INSERT faits hors de l'ORM
+        f"""CREATE TRIGGER IF NOT EXISTS commande_fts_ai AFTER INSERT ON commande{quand('new')} BEGIN
+            INSERT INTO commande_fts(rowid, {colonnes}) VALUES (new.id, {valeurs('new')});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS commande_fts_ad AFTER DELETE ON commande{quand('old')} BEGIN
+            INSERT INTO commande_fts(commande_fts, rowid, {colonnes}) VALUES ('delete', old.id, {valeurs('old')});
+        END""",
+        # Seulement sur les colonnes indexées : un changement de statut ne touche pas l'index
+        f"""CREATE TRIGGER IF NOT EXISTS commande_fts_au AFTER UPDATE OF {colonnes} ON commande{quand('old')} BEGIN
+            INSERT INTO commande_fts(commande_fts, rowid, {colonnes}) VALUES ('delete', old.id, {valeurs('old')});
+            INSERT INTO commande_fts(rowid, {colonnes}) VALUES (new.id, {valeurs('new')});
+        END""",
+    ]
+
+
+def _remplacer_triggers(connection, progression):
+    for suffixe in ('ai', 'ad', 'au'):
+        connection.execute(text(f"DROP TRIGGER IF EXISTS commande_fts_{suffixe}"))
+    for ddl in _ddl_index(progression)[1:]:
+        connection.execute(text(ddl))
+
+
+def creer_index(connection):
+    """Crée la table FTS5 et ses triggers s'ils n'existent pas. Renvoie True si la table a été créée."""
+    if connection.dialect.name != 'sqlite':
+        return False
+    existe = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'commande_fts'")
+    ).first()
+    for ddl in _ddl_index():
+        connection.execute(text(ddl))
+    return existe is None
+
+
+@event.listens_for(Commande.__table__, 'after_create')
+def _creer_index_avec_la_table(target, connection, **kw):
+    creer_index(connection)
+
+
+def reconstruire_index(taille_lot=TAILLE_LOT):
+    """Reconstruit l'index depuis la table commande sans bloquer les écritures longtemps.
+
+    L'index est vidé puis rempli par lots de `taille_lot` ids, une transaction courte par
+    lot, avec une pause entre deux lots pour laisser passer les commandes. Pendant ce
+    temps, la recherche ne trouve que les commandes déjà réindexées.
+    """
+    with db.engine.begin() as connection:
+        creer_index(connection)
+        connection.execute(text(f"DROP TABLE IF EXISTS {PROGRESSION}"))
+        connection.execute(text(f"CREATE TABLE {PROGRESSION} (id_max INTEGER NOT NULL)"))
+        connection.execute(text(f"INSERT INTO {PROGRESSION} VALUES (0)"))
+        _remplacer_triggers(connection, progression=True)
+        connection.execute(text("INSERT INTO commande_fts(commande_fts) VALUES ('delete-all')"))
+
+    copie = text(
+        f"INSERT INTO commande_fts(rowid, {', '.join(COLONNES)}) "
+        f"SELECT id, {', '.join(COLONNES)} FROM commande WHERE id > :debut AND id <= :fin"
+    )
+
+    def dernier_id():
+        with db.engine.connect() as connection:
+            return connection.execute(text("SELECT coalesce(max(id), 0) FROM commande")).scalar()
+
+    position = 0
+    while dernier_id() - position > taille_lot:
+        debut = time.perf_counter()
+        with db.engine.begin() as connection:
+            connection.execute(copie, {'debut': position, 'fin': position + taille_lot})
+            connection.execute(text(f"UPDATE {PROGRESSION} SET id_max = :fin"), {'fin': position + taille_lot})
+        position += taille_lot
+        # Autant de pause que de travail : les commandes en attente du verrou passent entre deux lots
+        time.sleep(time.perf_counter() - debut)
+
+    with db.engine.begin() as connection:
+        # Dernier lot et retour aux triggers normaux dans la même transaction : aucune commande entre les deux
+        connection.execute(copie, {'debut': position, 'fin': 2 ** 62})
+        _remplacer_triggers(connection, progression=False)
+        connection.execute(text(f"DROP TABLE {PROGRESSION}"))
+
+
+def _requete_fts(recherche):
+    # Chaque mot tapé devient une phrase entre guillemets avec préfixe ("dup"*) : pas d'injection
+    # de syntaxe FTS. Un mot comme "CMD-2026-0042" ou un email reste une seule phrase
+    # ("cmd 2026 0042"*) : beaucoup plus sélective que trois termes séparés, dont "com" ou
+    # "cmd" qui apparaissent dans toutes les commandes.
+    phrases = []
+    for mot in recherche.split():
+        tokens = re.findall(r'\w+', mot)
+        if tokens:
+            phrases.append('"' + ' '.join(tokens) + '"*')
+    return ' AND '.join(phrases)
+
+
+def rechercher_commandes(recherche, limite=50, seuil_classement=500):
+    """Commandes correspondant à la recherche, les plus pertinentes d'abord (bm25).
+
+    Le classement bm25 parcourt toutes les correspondances : au-delà de `seuil_classement`
+    résultats (recherche très large, ex: "gmail"), on renvoie les commandes les plus récentes.
+    """
+    requete = _requete_fts(recherche)
+    if not requete:
+        return []
+    nombre = db.session.execute(
+        text("SELECT count(*) FROM (SELECT rowid FROM commande_fts WHERE commande_fts MATCH :q LIMIT :seuil)"),
+        {'q': requete, 'seuil': seuil_classement + 1}
+    ).scalar()
+    if not nombre:
+        return []
+    ordre = 'rank' if nombre <= seuil_classement else 'rowid DESC'
+    ids = db.session.execute(
+        text(f"SELECT rowid FROM commande_fts WHERE commande_fts MATCH :q ORDER BY {ordre} LIMIT :limite"),
+        {'q': requete, 'limite': limite}
+    ).scalars().all()
+    par_id = {c.id: c for c in Commande.query.filter(Commande.id.in_(ids))}
+    return [par_id[i] for i in ids if i in par_id]
+
+
+def init_app(app):
+    @app.cli.command('search-rebuild')
+    def search_rebuild_command():
+        """(Re)construit l'index de recherche plein texte des commandes."""
+        debut = time.perf_counter()
+        reconstruire_index()
+        click.echo(f"Index de recherche reconstruit en {time.perf_counter() - debut:.1f}s.")
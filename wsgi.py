@@ -0,0 +1,13 @@
+"""Point d'entrée WSGI de production : gunicorn wsgi:app (réglages dans gunicorn.conf.py).
+
+Avec preload_app, ce module est importé une seule fois dans le processus maître, avant le
+fork des workers : tout ce qui est fait ici est partagé (copy-on-write) au lieu d'être
+refait par chaque worker. Le schéma doit exister au préalable (`flask init-db`).
+"""
+from app import create_app
+
+app = create_app()
+
+# Templates compilés une fois dans le maître plutôt qu'à la première requête de chaque worker
+for nom in app.jinja_env.list_templates():
+    app.jinja_env.get_template(nom)